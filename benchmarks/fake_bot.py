@@ -0,0 +1,194 @@
+"""
+压测用的 Bot、消息模型和数据库替身
+
+字段名与 omni_bot_sdk 的 Message / Bot 保持一致，只保留插件实际会访问的部分。
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, List, Optional
+
+from omni_bot_sdk.plugins.interface import MessageType
+
+
+@dataclass
+class FakeUserInfo:
+    nickname: str = "压测机器人"
+    account: str = "bench_bot"
+    username: str = "wxid_bench_bot"
+    data_dir: str = ""
+
+
+@dataclass
+class FakeContact:
+    username: str
+    display_name: str
+
+
+@dataclass
+class FakeRoom:
+    username: str
+    display_name: str
+
+    @property
+    def nick_name(self) -> str:
+        return self.display_name
+
+
+@dataclass
+class FakeMessage:
+    local_id: int
+    server_id: int
+    local_type: int
+    create_time: int
+    contact: FakeContact
+    room: Optional[FakeRoom] = None
+    content: str = ""
+    parsed_content: str = ""
+    is_self: bool = False
+    is_at: bool = False
+    quote_message: Optional["FakeMessage"] = None
+    message_db_path: str = "bench.db"
+    patted_username: str = ""
+    title: str = ""
+    file_name: str = ""
+    path: str = ""
+    user_info: Optional[FakeUserInfo] = None
+
+    @property
+    def is_chatroom(self) -> bool:
+        return self.room is not None
+
+    @property
+    def target(self) -> str:
+        if self.room:
+            return self.room.display_name
+        return self.contact.display_name
+
+    def to_text(self) -> str:
+        return self.content
+
+
+class FakeDatabase:
+    """
+    pat-plugin 用到的数据库查询，返回最近的消息行，第 17 列是发送者
+    """
+
+    def __init__(self, latency_ms: float = 0):
+        self.latency_ms = latency_ms
+        self.recent_senders = {}
+
+    def remember(self, message: FakeMessage):
+        key = message.room.username if message.room else message.contact.username
+        senders = self.recent_senders.setdefault(key, [])
+        senders.append(message.contact.username)
+        del senders[:-10]
+
+    def get_messages_by_username(self, message_db_path: str, username: str):
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        rows = []
+        for sender in self.recent_senders.get(username, []):
+            row = [None] * 18
+            row[17] = sender
+            rows.append(row)
+        return rows
+
+
+class FakeDatDecryptService:
+    def register_decrypt_callback(self, filename, callback):
+        pass
+
+
+class FakeProcessorService:
+    """
+    收集插件产生的 RPA 动作
+    """
+
+    def __init__(self):
+        self.actions: List[Any] = []
+
+    def add_rpa_actions(self, actions):
+        self.actions.extend(actions)
+
+
+@dataclass
+class FakeBot:
+    config: dict
+    user_info: FakeUserInfo
+    db: FakeDatabase = field(default_factory=FakeDatabase)
+    logger: logging.Logger = field(
+        default_factory=lambda: logging.getLogger("bench")
+    )
+    dat_decrypt_service: FakeDatDecryptService = field(
+        default_factory=FakeDatDecryptService
+    )
+    processor_service: FakeProcessorService = field(
+        default_factory=FakeProcessorService
+    )
+    rpa_task_queue: Any = None
+    plugin_manager: Any = None
+
+
+_TYPE_MAP = {
+    "text": MessageType.Text,
+    "quote": MessageType.Quote,
+    "pat": MessageType.Pat,
+    "system": MessageType.System,
+    "image": MessageType.Image,
+    "video": MessageType.Video,
+}
+
+
+def build_message(record: dict, index: int, user_info: FakeUserInfo) -> FakeMessage:
+    """
+    把 trace 中的一条记录转换成消息对象，记录格式见 message_trace.py
+    """
+    local_type = _TYPE_MAP[record.get("type", "text")]
+    contact = FakeContact(
+        username=record.get("sender", "wxid_user"),
+        display_name=record.get("sender_name") or record.get("sender", "用户"),
+    )
+    room = None
+    if record.get("room"):
+        room = FakeRoom(
+            username=record["room"],
+            display_name=record.get("room_name") or record["room"],
+        )
+    content = record.get("content", "")
+    parsed_content = content
+    if record.get("at_bot"):
+        parsed_content = f"@{user_info.nickname} {content}"
+    quote_message = None
+    if local_type == MessageType.Quote:
+        quote_message = FakeMessage(
+            local_id=0,
+            server_id=0,
+            local_type=MessageType.Text,
+            create_time=0,
+            contact=FakeContact(user_info.username, user_info.nickname),
+            is_self=bool(record.get("quote_bot")),
+        )
+    message = FakeMessage(
+        local_id=index,
+        server_id=record.get("server_id", 10_000_000 + index),
+        local_type=local_type,
+        create_time=int(record.get("create_time") or time.time()),
+        contact=contact,
+        room=room,
+        content=content,
+        parsed_content=parsed_content,
+        is_self=bool(record.get("is_self")),
+        is_at=bool(record.get("at_bot")),
+        quote_message=quote_message,
+        file_name=record.get("file_name", f"bench_{index}"),
+        path=record.get("path", ""),
+        user_info=user_info,
+    )
+    if local_type == MessageType.Pat:
+        message.patted_username = (
+            user_info.account if record.get("patted", "self") == "self" else "other"
+        )
+        message.title = f'"{contact.display_name}" 拍了拍我'
+    return message
@@ -0,0 +1,3 @@
+"""
+仅用于离线压测的 omni_bot_sdk 替身，只实现插件用到的接口
+"""
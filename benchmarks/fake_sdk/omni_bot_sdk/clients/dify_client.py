@@ -0,0 +1,53 @@
+"""
+omni_bot_sdk.clients.dify_client 的替身
+
+与 SDK 一样每次请求都是一次同步 HTTP 调用，只是改用标准库实现，
+这样压测环境不需要额外安装 requests。
+"""
+
+import json
+import urllib.error
+import urllib.request
+
+
+class _Response:
+    def __init__(self, status_code: int, body: bytes):
+        self.status_code = status_code
+        self.content = body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class DifyClient:
+    def __init__(self, api_key, base_url: str = "https://api.dify.ai/v1"):
+        self.api_key = api_key
+        self.base_url = base_url
+
+    def _send_request(self, method, endpoint, json_data=None):
+        request = urllib.request.Request(
+            f"{self.base_url}{endpoint}",
+            data=json.dumps(json_data).encode("utf-8") if json_data else None,
+            method=method,
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                return _Response(response.status, response.read())
+        except urllib.error.HTTPError as e:
+            return _Response(e.code, e.read())
+
+
+class WorkflowClient(DifyClient):
+    def run(
+        self, inputs: dict, response_mode: str = "streaming", user: str = "abc-123"
+    ):
+        data = {"inputs": inputs, "response_mode": response_mode, "user": user}
+        return self._send_request("POST", "/workflows/run", data)
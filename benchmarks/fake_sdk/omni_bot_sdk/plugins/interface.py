@@ -0,0 +1,186 @@
+"""
+omni_bot_sdk.plugins.interface 的替身
+
+Plugin / PluginExcuteContext / PluginExcuteResponse 的行为与 SDK 保持一致，
+RPA 动作只记录参数，不做任何操作。
+"""
+
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Protocol
+
+
+class MessageType:
+    Unknown = -1
+    Text = 1
+    Image = 3
+    Audio = 34
+    Video = 43
+    Emoji = 47
+    System = 10000
+    Quote = 244813135921
+    Pat = 266287972401
+
+
+class RPAAction:
+    """
+    记录插件产生的动作，压测时只统计数量
+    """
+
+    def __init__(self, **kwargs):
+        self.action_type = self.__class__.__name__
+        self.__dict__.update(kwargs)
+
+    def __repr__(self):
+        return f"{self.action_type}({self.__dict__})"
+
+
+class DownloadImageAction(RPAAction):
+    pass
+
+
+class SendImageAction(RPAAction):
+    pass
+
+
+class SendFileAction(RPAAction):
+    pass
+
+
+class DownloadVideoAction(RPAAction):
+    pass
+
+
+class DownloadFileAction(RPAAction):
+    pass
+
+
+class SendTextMessageAction(RPAAction):
+    pass
+
+
+class PatAction(RPAAction):
+    pass
+
+
+class Bot(Protocol):
+    config: dict
+    user_info: Any
+    db: Any
+    logger: logging.Logger
+
+
+class PluginExcuteResponse:
+    def __init__(
+        self,
+        plugin_name: str,
+        handled: bool = False,
+        should_stop: bool = False,
+        response: Dict[str, Any] = None,
+        actions: List[RPAAction] = None,
+        message: Any = None,
+    ):
+        self.plugin_name = plugin_name
+        self.handled = handled
+        self.should_stop = should_stop
+        self.response = response or {}
+        self.actions = actions or []
+        self.message = message
+
+    def add_action(self, action: RPAAction):
+        self.actions.append(action)
+
+    def get_actions(self) -> List[RPAAction]:
+        return self.actions or []
+
+
+class PluginExcuteContext:
+    def __init__(self, message: Any, context: dict):
+        self.message = message
+        self.context = context
+        self.errors = []
+        self.responses = []
+        self.should_stop = False
+
+    def get_message(self):
+        return self.message
+
+    def get_context(self) -> dict:
+        return self.context
+
+    def add_error(self, plugin_name: str, error_message: str):
+        self.errors.append(f"Error in {plugin_name}: {error_message}")
+
+    def add_response(self, value: PluginExcuteResponse):
+        self.responses.append(value)
+
+    def get_responses(self) -> List[PluginExcuteResponse]:
+        return self.responses
+
+
+class Plugin(ABC):
+    priority: int = 0
+
+    def __init__(self, bot: "Bot"):
+        self.bot = bot
+        self.logger = bot.logger
+        self.config = bot.config
+        self.rpa_queue = None
+        self.plugin_config = None
+        self.reload_plugin_config()
+
+    def _load_plugin_config(self):
+        return self.config.get("plugins", {}).get(self.get_plugin_name(), {})
+
+    def reload_plugin_config(self):
+        schema = self.get_plugin_config_schema()
+        self.plugin_config = schema(**self._load_plugin_config())
+        return self.plugin_config
+
+    def get_plugin_config(self, key, default=None):
+        return getattr(self.plugin_config, key, default)
+
+    def add_rpa_actions(self, actions: List[RPAAction]):
+        if actions:
+            self.bot.processor_service.add_rpa_actions(actions)
+
+    def add_rpa_action(self, action: RPAAction):
+        self.add_rpa_actions([action])
+
+    @classmethod
+    @abstractmethod
+    def get_plugin_config_schema(cls):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_priority(self) -> int:
+        return 0
+
+    @abstractmethod
+    async def handle_message(self, context: PluginExcuteContext):
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_plugin_name(self) -> str:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_plugin_description(self) -> str:
+        raise NotImplementedError
+
+
+__all__ = [
+    "Bot",
+    "Plugin",
+    "PluginExcuteContext",
+    "PluginExcuteResponse",
+    "MessageType",
+    "RPAAction",
+    "DownloadImageAction",
+    "SendImageAction",
+    "SendFileAction",
+    "DownloadVideoAction",
+    "DownloadFileAction",
+    "SendTextMessageAction",
+    "PatAction",
+]
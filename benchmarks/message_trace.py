@@ -0,0 +1,81 @@
+"""
+消息 trace 格式
+
+JSONL，每行一条消息，按 t 排序：
+
+    {"t": 0.25, "type": "text", "room": "r1@chatroom", "room_name": "群1",
+     "sender": "wxid_a", "sender_name": "张三", "content": "你好", "at_bot": true}
+
+字段说明：
+    t: 相对 trace 开始的时间（秒），回放时按 speed 缩放
+    type: text / quote / pat / system / image / video
+    room / room_name: 群聊 id 和名称，私聊不填
+    sender / sender_name: 发送者 id 和昵称
+    content: 文本内容，system 消息为原始系统消息内容
+    at_bot: 是否 @ 了机器人；quote_bot: 引用的是否为机器人消息
+    is_self: 是否为机器人自己发送；patted: pat 消息拍的对象，self 表示机器人
+    server_id / create_time / path / file_name: 可选，和 SDK 消息字段同名
+"""
+
+import json
+import random
+from typing import Iterable, List
+
+
+def load_trace(path: str) -> List[dict]:
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                records.append(json.loads(line))
+    records.sort(key=lambda r: r.get("t", 0))
+    return records
+
+
+def save_trace(path: str, records: Iterable[dict]):
+    with open(path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def synthetic_trace(
+    count: int, rooms: int = 5, rate: float = 20.0, seed: int = 0
+) -> List[dict]:
+    """
+    生成混合类型的消息流，rate 为每秒消息数，大部分是群聊文本
+    """
+    rnd = random.Random(seed)
+    records = []
+    t = 0.0
+    for i in range(count):
+        t += rnd.expovariate(rate)
+        sender = f"wxid_user{rnd.randrange(50)}"
+        record = {
+            "t": round(t, 4),
+            "type": "text",
+            "sender": sender,
+            "sender_name": sender.replace("wxid_", "用户"),
+            "content": f"第{i}条消息，今天天气怎么样",
+        }
+        if rnd.random() < 0.8:
+            room = rnd.randrange(rooms)
+            record["room"] = f"bench{room}@chatroom"
+            record["room_name"] = f"压测群{room}"
+        roll = rnd.random()
+        if roll < 0.15:
+            record["at_bot"] = True
+        elif roll < 0.2:
+            record["type"] = "quote"
+            record["quote_bot"] = True
+        elif roll < 0.23:
+            record["type"] = "pat"
+        elif roll < 0.25 and "room" in record:
+            record["type"] = "system"
+            record["content"] = f'"群主"邀请"{record["sender_name"]}"加入了群聊'
+        elif roll < 0.28:
+            record["type"] = "image"
+        elif roll < 0.3:
+            record["type"] = "video"
+        records.append(record)
+    return records
@@ -0,0 +1,138 @@
+"""
+本地模拟的 Dify / OpenAI 兼容服务
+
+- POST /v1/workflows/run: Dify 工作流，bot-check 返回 is_for_bot，welcome 返回海报地址
+- POST /v1/chat/completions: OpenAI 兼容的聊天补全，带 usage
+- GET /files/poster.png: 欢迎海报下载
+
+每个请求按 latency_ms ± jitter_ms 休眠后返回，用来模拟远程调用耗时。
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 1x1 透明 PNG
+POSTER_PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000100e221bc330000000049454e44ae426082"
+)
+
+
+class MockServer:
+    def __init__(
+        self,
+        latency_ms: float = 0,
+        jitter_ms: float = 0,
+        for_bot_ratio: float = 1.0,
+        host: str = "127.0.0.1",
+        seed: int = 0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.for_bot_ratio = for_bot_ratio
+        self.random = random.Random(seed)
+        self.request_count = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                server._sleep()
+                if self.path.endswith("/workflows/run"):
+                    self._send_json(server._workflow(payload))
+                elif self.path.endswith("/chat/completions"):
+                    self._send_json(server._completion(payload))
+                else:
+                    self._send(404, b"", "text/plain")
+
+            def do_GET(self):
+                server._sleep()
+                if self.path.startswith("/files/"):
+                    self._send(200, POSTER_PNG, "image/png")
+                else:
+                    self._send(404, b"", "text/plain")
+
+            def do_HEAD(self):
+                # 连接预热的探测请求，不计入请求数也不模拟延迟
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def _send_json(self, data):
+                self._send(200, json.dumps(data).encode("utf-8"), "application/json")
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, 0), Handler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def _sleep(self):
+        with self._lock:
+            self.request_count += 1
+            delay = self.latency_ms + self.random.uniform(
+                -self.jitter_ms, self.jitter_ms
+            )
+        if delay > 0:
+            time.sleep(delay / 1000)
+
+    def _workflow(self, payload: dict) -> dict:
+        inputs = payload.get("inputs", {})
+        if "user_name" in inputs:
+            outputs = {"image_urls": [f"{self.base_url}/files/poster.png"]}
+        else:
+            with self._lock:
+                is_for_bot = self.random.random() < self.for_bot_ratio
+            outputs = {"is_for_bot": is_for_bot}
+        return {"data": {"outputs": {"text": json.dumps(outputs)}}}
+
+    def _completion(self, payload: dict) -> dict:
+        messages = payload.get("messages", [])
+        prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 2 + 1
+        return {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get("model", "bench-model"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "这是压测回复"},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": 8,
+                "total_tokens": prompt_tokens + 8,
+            },
+        }
+
+    def start(self) -> "MockServer":
+        threading.Thread(
+            target=self.httpd.serve_forever, name="mock-server", daemon=True
+        ).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
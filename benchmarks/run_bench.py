@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线插件压测
+
+不需要微信客户端、omni-bot 主程序和真实的 Dify/OpenAI：
+- fake_sdk 提供 omni_bot_sdk 替身，fake_bot 提供 Bot 和消息模型
+- mock_servers 在本地模拟 Dify / OpenAI 兼容接口，延迟可配置
+- 按 trace 回放消息，按优先级依次执行插件链，和 SDK 的 PluginManager 一致
+
+输出每个插件的 p50/p99 耗时、吞吐和内存占用。
+
+用法：
+    python benchmarks/run_bench.py --synthetic 500
+    python benchmarks/run_bench.py --trace benchmarks/traces/sample.jsonl --speed 1
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tomllib
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+ENTRY_POINT_GROUP = "omni_bot.plugins"
+# 10us ~ 60s 的等比桶，本地插件通常在亚毫秒级，需要比线上指标更细的分辨率
+BENCH_BUCKETS = tuple(1e-5 * 1.25**i for i in range(70))
+
+
+def _setup_path():
+    """
+    fake_sdk 放在最前面，保证插件导入的是替身而不是真实 SDK
+    """
+    paths = [os.path.join(BENCH_DIR, "fake_sdk"), BENCH_DIR]
+    for name in sorted(os.listdir(REPO_DIR)):
+        src = os.path.join(REPO_DIR, name, "src")
+        if os.path.isdir(src):
+            paths.append(src)
+    for p in reversed(paths):
+        if p not in sys.path:
+            sys.path.insert(0, p)
+
+
+_setup_path()
+
+from fake_bot import FakeBot, FakeDatabase, FakeUserInfo, build_message  # noqa: E402
+from message_trace import load_trace, synthetic_trace  # noqa: E402
+from mock_servers import MockServer  # noqa: E402
+from omni_bot_sdk.plugins.interface import (  # noqa: E402
+    MessageType,
+    PluginExcuteContext,
+)
+from omni_plugin_common.dispatch import DispatchTable  # noqa: E402
+from omni_plugin_common.metrics import REGISTRY, Histogram  # noqa: E402
+from omni_plugin_common.scheduler import ConversationScheduler  # noqa: E402
+
+DEFAULT_PLUGINS = [
+    "bot-check-plugin",
+    "chat-context-plugin",
+    "dedup-plugin",
+    "image-plugin",
+    "openai-bot-plugin",
+    "pat-plugin",
+    "video-plugin",
+    "welcome-plugin",
+]
+
+
+def discover_plugins() -> dict:
+    """
+    从各插件 pyproject.toml 的入口点读取 插件id -> "模块:类"
+    """
+    plugins = {}
+    for name in sorted(os.listdir(REPO_DIR)):
+        pyproject = os.path.join(REPO_DIR, name, "pyproject.toml")
+        if not os.path.isfile(pyproject):
+            continue
+        with open(pyproject, "rb") as f:
+            data = tomllib.load(f)
+        entry_points = data.get("project", {}).get("entry-points", {})
+        plugins.update(entry_points.get(ENTRY_POINT_GROUP, {}))
+    return plugins
+
+
+def load_plugin_class(target: str):
+    module_name, class_name = target.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def build_config(plugin_ids, dify: MockServer, openai_server: MockServer) -> dict:
+    dify_url = f"{dify.base_url}/v1"
+    config = {
+        "bot-check-plugin": {
+            "dify_api_key": "bench",
+            "dify_base_url": dify_url,
+            "nick_name": "机器人",
+            "warm_connections": 1,
+        },
+        "openai-bot-plugin": {
+            "openai_api_key": "bench",
+            "openai_base_url": f"{openai_server.base_url}/v1/",
+            "openai_model": "bench-model",
+            "warm_connections": 1,
+        },
+        "welcome-plugin": {
+            "dify_api_key": "bench",
+            "dify_base_url": dify_url,
+            "all_room_allowed": True,
+            "warm_connections": 1,
+        },
+    }
+    return {
+        "plugins": {
+            plugin_id: {"enabled": True, **config.get(plugin_id, {})}
+            for plugin_id in plugin_ids
+        }
+    }
+
+
+class PluginStats:
+    def __init__(self):
+        self.latency = Histogram(BENCH_BUCKETS)
+        self.memory_bytes = 0
+        self.errors = 0
+        self.stops = 0
+
+
+class BenchRunner:
+    """
+    与 SDK PluginManager.process_message 一致的插件链，额外记录每个插件的耗时和内存
+    dispatch 为 True 时按 DispatchTable 只调用声明了该消息类型的插件
+    """
+
+    def __init__(self, plugins, track_memory: bool = True, dispatch: bool = False):
+        self.plugins = sorted(plugins, key=lambda p: p.get_priority(), reverse=True)
+        self.dispatch_table = DispatchTable(self.plugins) if dispatch else None
+        self.stats = {p.get_plugin_name(): PluginStats() for p in self.plugins}
+        self.track_memory = track_memory
+        self.message_latency = Histogram(BENCH_BUCKETS)
+        self.responses = 0
+
+    async def process_message(self, message, context: dict):
+        excute_context = PluginExcuteContext(message, context)
+        message_start = time.perf_counter()
+        plugins = (
+            self.dispatch_table.plugins_for(message)
+            if self.dispatch_table
+            else self.plugins
+        )
+        for plugin in plugins:
+            stats = self.stats[plugin.get_plugin_name()]
+            mem_before = tracemalloc.get_traced_memory()[0] if self.track_memory else 0
+            start = time.perf_counter()
+            try:
+                await plugin.handle_message(excute_context)
+            except Exception as e:
+                stats.errors += 1
+                excute_context.add_error(plugin.get_plugin_name(), str(e))
+            stats.latency.observe(time.perf_counter() - start)
+            if self.track_memory:
+                stats.memory_bytes += tracemalloc.get_traced_memory()[0] - mem_before
+            if excute_context.should_stop is True:
+                stats.stops += 1
+                break
+        self.message_latency.observe(time.perf_counter() - message_start)
+        self.responses += len(excute_context.get_responses())
+
+
+async def replay(
+    runner: BenchRunner, bot: FakeBot, records, speed: float, conversation_workers: int = 0
+):
+    """
+    speed > 0 时按 trace 时间回放，每条消息一个任务，和 SDK 的异步提交方式一致；
+    speed == 0 时逐条处理，测最大吞吐。
+    conversation_workers > 0 时经过按会话并发的调度器，speed == 0 时一次性全部提交
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    tasks = []
+    scheduler = None
+    if conversation_workers > 0:
+        scheduler = ConversationScheduler(
+            runner.process_message,
+            workers=conversation_workers,
+            max_queue_per_conversation=len(records) or 1,
+        )
+    for index, record in enumerate(records):
+        message = build_message(record, index, bot.user_info)
+        if message.local_type in (MessageType.Text, MessageType.Quote):
+            bot.db.remember(message)
+        context = {"user": bot.user_info}
+        if speed > 0:
+            delay = start + record.get("t", 0) / speed - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        if scheduler:
+            tasks.append(scheduler.submit(message, context))
+        elif speed > 0:
+            tasks.append(asyncio.create_task(runner.process_message(message, context)))
+        else:
+            await runner.process_message(message, context)
+    if tasks:
+        await asyncio.gather(*tasks)
+    if scheduler:
+        await scheduler.close()
+
+
+def format_report(runner: BenchRunner, count: int, elapsed: float, peak: int) -> str:
+    lines = [
+        f"{'plugin':<22}{'calls':>8}{'p50(ms)':>10}{'p99(ms)':>10}"
+        f"{'mean(ms)':>10}{'stops':>7}{'errors':>8}{'mem(KB)':>10}"
+    ]
+    for name, s in runner.stats.items():
+        h = s.latency
+        mean = h.sum / h.count * 1000 if h.count else 0.0
+        lines.append(
+            f"{name:<22}{h.count:>8}{h.quantile(0.5) * 1000:>10.2f}"
+            f"{h.quantile(0.99) * 1000:>10.2f}{mean:>10.2f}{s.stops:>7}"
+            f"{s.errors:>8}{s.memory_bytes / 1024:>10.1f}"
+        )
+    m = runner.message_latency
+    lines.append("")
+    lines.append(
+        f"messages={count} elapsed={elapsed:.2f}s throughput={count / elapsed if elapsed else 0:.1f} msg/s "
+        f"p50={m.quantile(0.5) * 1000:.2f}ms p99={m.quantile(0.99) * 1000:.2f}ms "
+        f"responses={runner.responses} peak_mem={peak / 1024 / 1024:.2f}MB"
+    )
+    summary = REGISTRY.format_summary()
+    if summary:
+        lines.append("")
+        lines.append("插件内部指标:")
+        lines.append(summary)
+    return "\n".join(lines)
+
+
+def report_json(runner: BenchRunner, count: int, elapsed: float, peak: int) -> dict:
+    return {
+        "messages": count,
+        "elapsed": elapsed,
+        "throughput": count / elapsed if elapsed else 0.0,
+        "peak_memory_bytes": peak,
+        "plugins": {
+            name: {
+                "calls": s.latency.count,
+                "p50": s.latency.quantile(0.5),
+                "p99": s.latency.quantile(0.99),
+                "stops": s.stops,
+                "errors": s.errors,
+                "memory_bytes": s.memory_bytes,
+            }
+            for name, s in runner.stats.items()
+        },
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="离线插件压测")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--trace", help="JSONL 格式的消息 trace")
+    source.add_argument("--synthetic", type=int, default=200, help="生成的消息数量")
+    parser.add_argument("--speed", type=float, default=0, help="回放倍速，0 为逐条全速处理")
+    parser.add_argument("--plugins", default=",".join(DEFAULT_PLUGINS), help="逗号分隔的插件 id")
+    parser.add_argument("--dify-latency-ms", type=float, default=200)
+    parser.add_argument("--openai-latency-ms", type=float, default=800)
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--db-latency-ms", type=float, default=2)
+    parser.add_argument("--for-bot-ratio", type=float, default=0.3)
+    parser.add_argument(
+        "--conversation-workers", type=int, default=0, help="按会话并发处理的 worker 数，0 为不启用"
+    )
+    parser.add_argument("--dispatch", action="store_true", help="按消息类型分发，跳过不相关的插件")
+    parser.add_argument("--no-memory", action="store_true", help="不统计内存，减少测量开销")
+    parser.add_argument("--json", help="把结果写入 JSON 文件")
+    parser.add_argument("--log-level", default="WARNING")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level)
+    records = load_trace(args.trace) if args.trace else synthetic_trace(args.synthetic)
+
+    dify = MockServer(
+        args.dify_latency_ms, args.jitter_ms, for_bot_ratio=args.for_bot_ratio
+    ).start()
+    openai_server = MockServer(args.openai_latency_ms, args.jitter_ms).start()
+    plugin_ids = [p.strip() for p in args.plugins.split(",") if p.strip()]
+    available = discover_plugins()
+    data_dir = tempfile.mkdtemp(prefix="omni-bench-")
+    bot = FakeBot(
+        config=build_config(plugin_ids, dify, openai_server),
+        user_info=FakeUserInfo(data_dir=data_dir),
+        db=FakeDatabase(args.db_latency_ms),
+    )
+    plugins = []
+    for plugin_id in plugin_ids:
+        if plugin_id not in available:
+            print(f"未找到插件: {plugin_id}", file=sys.stderr)
+            continue
+        plugins.append(load_plugin_class(available[plugin_id])(bot))
+
+    track_memory = not args.no_memory
+    if track_memory:
+        tracemalloc.start()
+    runner = BenchRunner(plugins, track_memory=track_memory, dispatch=args.dispatch)
+    REGISTRY.reset()
+    start = time.perf_counter()
+    try:
+        asyncio.run(
+            replay(runner, bot, records, args.speed, args.conversation_workers)
+        )
+    finally:
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if track_memory else 0
+        dify.stop()
+        openai_server.stop()
+    print(format_report(runner, len(records), elapsed, peak))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report_json(runner, len(records), elapsed, peak), f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+离线统计插件启动耗时
+
+每个插件在独立进程中导入并实例化，分别测启用和未启用两种配置，
+公共依赖的导入耗时不会互相分摊。
+
+用法：
+    python benchmarks/startup_profile.py
+    python benchmarks/startup_profile.py --plugins openai-bot-plugin,welcome-plugin
+"""
+
+import argparse
+import json
+import logging
+import sys
+import tempfile
+
+# run_bench 导入时会把 fake_sdk 和各插件的 src 加入 sys.path
+from run_bench import DEFAULT_PLUGINS, discover_plugins
+
+from fake_bot import FakeBot, FakeUserInfo  # noqa: E402
+from omni_plugin_common.startup import (  # noqa: E402
+    format_profile,
+    profile_isolated,
+    profile_plugin,
+)
+
+
+def build_bot(plugin_id: str, enabled: bool) -> FakeBot:
+    # 不启动 mock 服务，启动阶段不应该发出任何请求
+    config = {
+        "plugins": {
+            plugin_id: {
+                "enabled": enabled,
+                "dify_api_key": "bench",
+                "dify_base_url": "http://127.0.0.1:9/v1",
+                "openai_api_key": "bench",
+                "openai_base_url": "http://127.0.0.1:9/v1/",
+            }
+        }
+    }
+    return FakeBot(
+        config=config, user_info=FakeUserInfo(data_dir=tempfile.mkdtemp(prefix="omni-startup-"))
+    )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="离线统计插件启动耗时")
+    parser.add_argument("--plugins", default=",".join(DEFAULT_PLUGINS), help="逗号分隔的插件 id")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--enabled", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING)
+    available = discover_plugins()
+    if args.child:
+        row = profile_plugin(
+            args.child, available[args.child], lambda: build_bot(args.child, args.enabled)
+        )
+        print(json.dumps(row))
+        return
+
+    rows = []
+    for plugin_id in [p.strip() for p in args.plugins.split(",") if p.strip()]:
+        if plugin_id not in available:
+            print(f"未找到插件: {plugin_id}", file=sys.stderr)
+            continue
+        for enabled in (True, False):
+            child = [sys.executable, __file__, "--child", plugin_id]
+            if enabled:
+                child.append("--enabled")
+            row = profile_isolated(plugin_id, child)
+            row["plugin"] = f"{plugin_id}{'' if enabled else ' (off)'}"
+            rows.append(row)
+    print(format_profile(rows))
+
+
+if __name__ == "__main__":
+    main()
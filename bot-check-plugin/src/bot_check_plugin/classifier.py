@@ -0,0 +1,220 @@
+"""
+本地 is_for_bot 分类器
+
+字符 n-gram 哈希特征 + 逻辑回归，纯 numpy 在 CPU 上运行，单条预测远小于 1 毫秒。
+用 bot-check 记录下来的 Dify 判断结果离线训练：
+
+    python -m bot_check_plugin.classifier train verdicts.jsonl model.npz
+    python -m bot_check_plugin.classifier eval verdicts.jsonl model.npz
+
+训练数据每行一条 JSON：
+    {"chat_history": "...", "message": "...", "is_chatroom": true, "is_at": false, "is_for_bot": true}
+"""
+
+import argparse
+import json
+import math
+import random
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_DIM = 1 << 18
+DEFAULT_NGRAM_MAX = 3
+DEFAULT_HISTORY_SIZE = 3
+
+Sample = Tuple[np.ndarray, np.ndarray]
+
+
+def _parse_history(chat_history: str) -> List[dict]:
+    if not chat_history:
+        return []
+    try:
+        history = json.loads(chat_history)
+    except ValueError:
+        return []
+    return history if isinstance(history, list) else []
+
+
+def _sigmoid(z: float) -> float:
+    # 按符号分开计算，|z| 很大时 exp 不会溢出
+    if z >= 0:
+        return 1.0 / (1.0 + math.exp(-z))
+    e = math.exp(z)
+    return e / (1.0 + e)
+
+
+def _ngrams(text: str, n_max: int) -> Iterable[str]:
+    text = text.strip()
+    for n in range(1, n_max + 1):
+        for i in range(len(text) - n + 1):
+            yield text[i : i + n]
+
+
+class ForBotClassifier:
+    def __init__(
+        self,
+        weights: np.ndarray,
+        bias: float = 0.0,
+        ngram_max: int = DEFAULT_NGRAM_MAX,
+        history_size: int = DEFAULT_HISTORY_SIZE,
+    ):
+        dim = len(weights)
+        if dim & (dim - 1):
+            raise ValueError(f"特征维度必须是 2 的幂: {dim}")
+        self.weights = weights.astype(np.float32, copy=False)
+        self.bias = float(bias)
+        self.ngram_max = ngram_max
+        self.history_size = history_size
+        self._mask = dim - 1
+
+    @classmethod
+    def empty(cls, dim: int = DEFAULT_DIM, **kwargs) -> "ForBotClassifier":
+        return cls(np.zeros(dim, dtype=np.float32), **kwargs)
+
+    @classmethod
+    def load(cls, path: str) -> "ForBotClassifier":
+        data = np.load(path)
+        return cls(
+            data["weights"],
+            float(data["bias"]),
+            int(data["ngram_max"]),
+            int(data["history_size"]),
+        )
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                weights=self.weights,
+                bias=np.float32(self.bias),
+                ngram_max=np.int32(self.ngram_max),
+                history_size=np.int32(self.history_size),
+            )
+
+    def _hash(self, feature: str) -> int:
+        # 不能用内置 hash，进程间不稳定
+        return zlib.crc32(feature.encode("utf-8")) & self._mask
+
+    def featurize(
+        self, text: str, chat_history: str = "", is_chatroom: bool = False, is_at: bool = False
+    ) -> Sample:
+        features = {f"m:{g}" for g in _ngrams(text or "", self.ngram_max)}
+        features.add(f"room:{int(bool(is_chatroom))}")
+        features.add(f"at:{int(bool(is_at))}")
+        history = _parse_history(chat_history)
+        # chat_history 的最后一条就是当前消息，取它之前的几条
+        previous = history[-self.history_size - 1 : -1]
+        for item in previous:
+            for g in _ngrams(str(item.get("content", "")), 2):
+                features.add(f"h:{g}")
+        if previous:
+            features.add(f"prev_bot:{int(bool(previous[-1].get('is_bot')))}")
+        indices = np.unique(
+            np.fromiter((self._hash(f) for f in features), dtype=np.int64)
+        )
+        values = np.full(len(indices), 1.0 / np.sqrt(max(len(indices), 1)), dtype=np.float32)
+        return indices, values
+
+    def predict_sample(self, sample: Sample) -> float:
+        indices, values = sample
+        return _sigmoid(float(self.weights[indices] @ values) + self.bias)
+
+    def predict_proba(self, *args, **kwargs) -> float:
+        """
+        返回 is_for_bot 的概率，参数同 featurize
+        """
+        return self.predict_sample(self.featurize(*args, **kwargs))
+
+    def featurize_record(self, record: dict) -> Sample:
+        return self.featurize(
+            record.get("message", ""),
+            record.get("chat_history", ""),
+            record.get("is_chatroom", False),
+            record.get("is_at", False),
+        )
+
+
+def load_verdicts(path: str) -> List[dict]:
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                records.append(json.loads(line))
+    return records
+
+
+def train(
+    records: List[dict],
+    dim: int = DEFAULT_DIM,
+    epochs: int = 5,
+    lr: float = 0.5,
+    l2: float = 1e-6,
+    seed: int = 0,
+    classifier: Optional[ForBotClassifier] = None,
+) -> ForBotClassifier:
+    """
+    稀疏 SGD 训练逻辑回归，传入 classifier 时在已有权重上继续训练
+    """
+    model = classifier or ForBotClassifier.empty(dim)
+    samples = [(model.featurize_record(r), float(bool(r["is_for_bot"]))) for r in records]
+    rnd = random.Random(seed)
+    for _ in range(epochs):
+        rnd.shuffle(samples)
+        for (indices, values), label in samples:
+            gradient = model.predict_sample((indices, values)) - label
+            w = model.weights[indices]
+            model.weights[indices] = w - lr * (gradient * values + l2 * w)
+            model.bias -= lr * gradient
+    return model
+
+
+def evaluate(model: ForBotClassifier, records: List[dict], threshold: float) -> dict:
+    correct = confident = confident_correct = 0
+    for record in records:
+        prob = model.predict_sample(model.featurize_record(record))
+        label = bool(record["is_for_bot"])
+        correct += (prob >= 0.5) == label
+        if max(prob, 1 - prob) >= threshold:
+            confident += 1
+            confident_correct += (prob >= 0.5) == label
+    total = len(records) or 1
+    return {
+        "samples": len(records),
+        "accuracy": correct / total,
+        "coverage": confident / total,
+        "confident_accuracy": confident_correct / confident if confident else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="训练/评估本地 is_for_bot 分类器")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train_parser = sub.add_parser("train")
+    train_parser.add_argument("verdicts")
+    train_parser.add_argument("model")
+    train_parser.add_argument("--dim", type=int, default=DEFAULT_DIM)
+    train_parser.add_argument("--epochs", type=int, default=5)
+    train_parser.add_argument("--lr", type=float, default=0.5)
+    train_parser.add_argument("--resume", action="store_true", help="在已有模型上继续训练")
+    eval_parser = sub.add_parser("eval")
+    eval_parser.add_argument("verdicts")
+    eval_parser.add_argument("model")
+    eval_parser.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args(argv)
+
+    records = load_verdicts(args.verdicts)
+    if args.command == "train":
+        base = ForBotClassifier.load(args.model) if args.resume else None
+        model = train(records, dim=args.dim, epochs=args.epochs, lr=args.lr, classifier=base)
+        model.save(args.model)
+        print(f"训练完成，样本数: {len(records)}，模型: {args.model}")
+    else:
+        model = ForBotClassifier.load(args.model)
+        print(json.dumps(evaluate(model, records, args.threshold), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,36 @@
+import asyncio
+import functools
 import json
-from omni_bot_sdk.clients.dify_client import WorkflowClient
+import threading
+from typing import Literal, Optional
+
 from omni_bot_sdk.plugins.interface import (
     Bot,
     Plugin,
     PluginExcuteContext,
     MessageType,
 )
-from pydantic import BaseModel
+from omni_plugin_common.context_keys import (
+    BOT_CHECK,
+    CHAT_HISTORY,
+    CHAT_SUMMARY,
+    NOT_FOR_BOT,
+)
+from omni_plugin_common.dispatch import SCOPE_ALL, SCOPE_ROOM, MessageFilter
+from omni_plugin_common.ledger import LEDGER
+from omni_plugin_common.metrics import (
+    REGISTRY,
+    instrument_plugin,
+    mark_failed,
+    track_call,
+)
+from omni_plugin_common.pool_config import PoolConfig, start_dify_keep_warm
+
 
+CLASSIFIER_RESULTS = "omni_plugin_bot_check_classifier_total"
 
-class BotCheckPluginConfig(BaseModel):
+
+class BotCheckPluginConfig(PoolConfig):
     """
     bot_check_plugin 配置
     enabled: 是否启用该插件
@@ -17,6 +38,12 @@ class BotCheckPluginConfig(BaseModel):
     dify_base_url: Dify API基础URL
     nick_name: 机器人昵称
     priority: 插件优先级，数值越大优先级越高
+    classifier_model_path: 本地分类器模型路径，为空时不启用
+    classifier_mode: shadow 只对比不采用，active 置信度足够时直接采用本地结果
+    classifier_threshold: active 模式下采用本地结果的最低置信度
+    verdict_log_path: 记录 Dify 判断结果的 jsonl 文件，用于训练本地分类器，为空时不记录
+    include_chat_summary: 是否把 chat_summary 作为 Dify 工作流的输入变量，工作流中需要声明该变量
+    连接池字段见 PoolConfig，warm_connections 大于 0 时在启动时预热到 dify_base_url 的连接
     """
 
     enabled: bool = False
@@ -25,6 +52,11 @@ class BotCheckPluginConfig(BaseModel):
     nick_name: str = ""
     priority: int = 1002
     only_room: bool = False
+    classifier_model_path: str = ""
+    classifier_mode: Literal["shadow", "active"] = "shadow"
+    classifier_threshold: float = 0.9
+    verdict_log_path: str = ""
+    include_chat_summary: bool = False
 
 
 class BotCheckPlugin(Plugin):
@@ -39,28 +71,115 @@ class BotCheckPlugin(Plugin):
         super().__init__(bot)
         self.dify_api_key = self.plugin_config.dify_api_key
         self.dify_base_url = self.plugin_config.dify_base_url
-        self.dify_client = WorkflowClient(self.dify_api_key, self.dify_base_url)
+        self.enabled = self.plugin_config.enabled
         self.user = bot.user_info
         self.nick_name = self.plugin_config.nick_name
         self.priority = getattr(self.plugin_config, "priority", self.__class__.priority)
         self.only_room = self.plugin_config.only_room
+        self.message_filter = MessageFilter(
+            message_types=(MessageType.Text, MessageType.Quote),
+            scope=SCOPE_ROOM if self.only_room else SCOPE_ALL,
+        )
+        self.classifier_mode = self.plugin_config.classifier_mode
+        self.classifier_threshold = self.plugin_config.classifier_threshold
+        self.verdict_log_path = self.plugin_config.verdict_log_path
+        self.include_chat_summary = self.plugin_config.include_chat_summary
+        self._verdict_log_lock = threading.Lock()
+        self.classifier = None
+        if self.enabled and self.plugin_config.classifier_model_path:
+            # numpy 只有启用本地分类器时才导入
+            from .classifier import ForBotClassifier
+
+            self.classifier = ForBotClassifier.load(
+                self.plugin_config.classifier_model_path
+            )
+            self.logger.info(f"已加载本地分类器，模式: {self.classifier_mode}")
+        self.keep_warm_stop_event = start_dify_keep_warm(self)
+
+    @functools.cached_property
+    def dify_client(self):
+        # 第一次使用时才创建客户端，未启用的插件不会创建，连接在多次调用之间复用
+        from omni_plugin_common.http_pool import dify_workflow_client
+
+        return dify_workflow_client(self.name, self.plugin_config)
 
     def get_priority(self) -> int:
         return self.priority
 
-    async def handle_message(self, plusginExcuteContext: PluginExcuteContext) -> None:
-        # TODO 对群聊和私聊，采用不同的判别方式，参数加一个是否群聊
-        message = plusginExcuteContext.get_message()
-        if self.only_room and not message.is_chatroom:
-            return
-        if (
-            message.local_type != MessageType.Text
-            and message.local_type != MessageType.Quote
-        ):
-            return
-        context = plusginExcuteContext.get_context()
-        context["bot_check"] = True  # 添加一个变量，用于告诉后续的节点，已经经过了判断
-        chat_history = context.get("chat_history", "")
+    def get_message_filter(self) -> MessageFilter:
+        return self.message_filter
+
+    def _message_text(self, message) -> str:
+        # 与 chat-context 中记录的内容保持一致
+        if message.local_type == MessageType.Quote:
+            return str(message.to_text() or "")
+        return str(message.parsed_content or "")
+
+    async def _log_verdict(self, message, chat_history: str, is_for_bot: bool):
+        record = {
+            "chat_history": chat_history,
+            "message": self._message_text(message),
+            "is_chatroom": message.is_chatroom,
+            "is_at": bool(getattr(message, "is_at", False)),
+            "is_for_bot": is_for_bot,
+        }
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        # 文件写入放到线程中执行，不阻塞事件循环
+        await asyncio.to_thread(self._append_verdict, line)
+
+    def _append_verdict(self, line: str):
+        try:
+            with self._verdict_log_lock:
+                with open(self.verdict_log_path, "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            self.logger.warning(f"记录判断结果失败: {e}")
+
+    async def _check_not_for_bot(
+        self, message, plusginExcuteContext: PluginExcuteContext
+    ) -> bool:
+        """
+        判断消息是否 for bot，返回 not_for_bot
+        启用本地分类器时，active 模式下置信度足够直接采用本地结果，否则调用 Dify；
+        shadow 模式下总是调用 Dify，只记录两者不一致的情况
+        """
+        chat_history = await CHAT_HISTORY.aget(plusginExcuteContext)
+        local_prob = None
+        if self.classifier:
+            local_prob = self.classifier.predict_proba(
+                self._message_text(message),
+                chat_history,
+                message.is_chatroom,
+                getattr(message, "is_at", False),
+            )
+            confidence = max(local_prob, 1 - local_prob)
+            if self.classifier_mode == "active" and confidence >= self.classifier_threshold:
+                REGISTRY.inc(CLASSIFIER_RESULTS, (("result", "local"),))
+                return local_prob < 0.5
+        chat_summary = CHAT_SUMMARY.get(plusginExcuteContext) if self.include_chat_summary else None
+        is_for_bot = await self._remote_is_for_bot(message, chat_history, chat_summary)
+        if is_for_bot is None:
+            return True
+        if self.verdict_log_path:
+            await self._log_verdict(message, chat_history, is_for_bot)
+        if local_prob is not None:
+            if (local_prob >= 0.5) == is_for_bot:
+                REGISTRY.inc(CLASSIFIER_RESULTS, (("result", "agree"),))
+            else:
+                REGISTRY.inc(CLASSIFIER_RESULTS, (("result", "disagree"),))
+                # 不记录消息原文，需要时按 server_id 在判断记录中查找
+                self.logger.info(
+                    f"本地分类器与 Dify 判断不一致: local={local_prob:.3f} dify={is_for_bot} "
+                    f"server_id={getattr(message, 'server_id', '')}"
+                )
+        return not is_for_bot
+
+    async def _remote_is_for_bot(
+        self, message, chat_history: str, chat_summary: Optional[str] = None
+    ) -> Optional[bool]:
+        """
+        调用 Dify 工作流判断消息是否 for bot，出错时返回 None
+        """
         try:
             request_params = {
                 "inputs": {
@@ -72,16 +191,42 @@ class BotCheckPlugin(Plugin):
                 "response_mode": "blocking",
                 "user": f"{message.room.username if message.is_chatroom else message.contact.username}",
             }
-            completion_response = self.dify_client.run(**request_params)
-            completion_response.raise_for_status()
-            result = completion_response.json().get("data").get("outputs")
+            if chat_summary is not None:
+                request_params["inputs"]["chat_summary"] = chat_summary
+            with track_call(self.name, "dify_workflow"), LEDGER.call(
+                request_params["user"], "dify-workflow", f"{self.name}/dify_workflow"
+            ) as entry:
+                # 同步 HTTP 调用放到线程中执行，不阻塞其他会话的消息处理
+                completion_response = await asyncio.to_thread(
+                    self.dify_client.run, **request_params
+                )
+                completion_response.raise_for_status()
+                data = completion_response.json().get("data")
+                # Dify 工作流只返回总 token 数
+                entry.set_usage(total_tokens=data.get("total_tokens"))
+            result = data.get("outputs")
             workflow_result = json.loads(result.get("text", "{}"))
-            if not workflow_result.get("is_for_bot", False):
-                context["not_for_bot"] = True
-                return
+            return bool(workflow_result.get("is_for_bot", False))
         except Exception as e:
-            context["not_for_bot"] = True
+            self.logger.warning(f"Dify 判断是否 for bot 出错: {e}")
+            mark_failed(self.name)
+            return None
+
+    @instrument_plugin
+    async def handle_message(self, plusginExcuteContext: PluginExcuteContext) -> None:
+        # TODO 对群聊和私聊，采用不同的判别方式，参数加一个是否群聊
+        if not self.enabled:
+            return
+        message = plusginExcuteContext.get_message()
+        if not self.message_filter.matches(message):
             return
+        BOT_CHECK.set(plusginExcuteContext, True)  # 添加一个变量，用于告诉后续的节点，已经经过了判断
+        # 只登记判断方法，后续插件读取 not_for_bot 时才调用 Dify，没有插件读取就不调用
+        NOT_FOR_BOT.provide(
+            plusginExcuteContext,
+            lambda: self._check_not_for_bot(message, plusginExcuteContext),
+            owner=self.name,
+        )
 
     def get_plugin_name(self) -> str:
         return self.name
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 not_for_bot 的判断流程，使用假的分类器和 Dify 判断，不需要 numpy
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(ROOT, "src"))
+sys.path.insert(0, os.path.join(ROOT, "..", "omni-plugin-common", "src"))
+try:
+    import omni_bot_sdk  # noqa: F401
+except ImportError:
+    # 没有安装 SDK 时使用压测用的假 SDK
+    sys.path.insert(0, os.path.join(ROOT, "..", "benchmarks", "fake_sdk"))
+
+from bot_check_plugin.main import CLASSIFIER_RESULTS, BotCheckPlugin  # noqa: E402
+from omni_bot_sdk.plugins.interface import MessageType  # noqa: E402
+from omni_plugin_common.context_keys import CHAT_HISTORY  # noqa: E402
+from omni_plugin_common.metrics import REGISTRY  # noqa: E402
+
+
+class FakeClassifier:
+    def __init__(self, prob):
+        self.prob = prob
+
+    def predict_proba(self, message, chat_history, is_chatroom, is_at):
+        return self.prob
+
+
+class FakeExcuteContext:
+    def __init__(self):
+        self.context = {}
+
+    def get_context(self):
+        return self.context
+
+
+def make_plugin(prob=None, mode="shadow", remote=True, verdict_log_path=""):
+    plugin = BotCheckPlugin.__new__(BotCheckPlugin)
+    plugin.logger = logging.getLogger("test")
+    plugin.classifier = FakeClassifier(prob) if prob is not None else None
+    plugin.classifier_mode = mode
+    plugin.classifier_threshold = 0.9
+    plugin.include_chat_summary = False
+    plugin.verdict_log_path = verdict_log_path
+    plugin._verdict_log_lock = threading.Lock()
+    plugin.remote_calls = 0
+
+    async def _remote_is_for_bot(message, chat_history, chat_summary=None):
+        plugin.remote_calls += 1
+        return remote
+
+    plugin._remote_is_for_bot = _remote_is_for_bot
+    return plugin
+
+
+def check(plugin):
+    message = SimpleNamespace(
+        local_type=MessageType.Text,
+        parsed_content="@机器人 帮我查一下天气",
+        is_chatroom=True,
+        is_at=True,
+        server_id="1001",
+    )
+    excute_context = FakeExcuteContext()
+    CHAT_HISTORY.set(excute_context, "[]")
+    return asyncio.run(plugin._check_not_for_bot(message, excute_context))
+
+
+def classifier_results():
+    counters, _ = REGISTRY.snapshot()
+    return {
+        dict(labels)["result"]: value
+        for (name, labels), value in counters.items()
+        if name == CLASSIFIER_RESULTS
+    }
+
+
+def test_active_confident_skips_remote():
+    REGISTRY.reset()
+    plugin = make_plugin(prob=0.97, mode="active", remote=False)
+    assert check(plugin) is False
+    assert plugin.remote_calls == 0
+    assert classifier_results() == {"local": 1}
+    # 置信度不够时仍然调用 Dify
+    plugin = make_plugin(prob=0.6, mode="active", remote=False)
+    assert check(plugin) is True
+    assert plugin.remote_calls == 1
+    REGISTRY.reset()
+
+
+def test_shadow_agree_disagree(tmp_path):
+    REGISTRY.reset()
+    log_path = str(tmp_path / "verdicts.jsonl")
+    # shadow 模式下置信度再高也调用 Dify
+    assert check(make_plugin(prob=0.97, remote=True, verdict_log_path=log_path)) is False
+    assert check(make_plugin(prob=0.97, remote=False, verdict_log_path=log_path)) is True
+    assert classifier_results() == {"agree": 1, "disagree": 1}
+    with open(log_path, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    assert [r["is_for_bot"] for r in records] == [True, False]
+    assert records[0]["message"] == "@机器人 帮我查一下天气"
+    assert records[0]["is_at"] is True
+    REGISTRY.reset()
+
+
+def test_remote_error_without_classifier(tmp_path):
+    REGISTRY.reset()
+    log_path = str(tmp_path / "verdicts.jsonl")
+    # Dify 出错时不记录判断结果，按 not_for_bot 处理
+    plugin = make_plugin(remote=None, verdict_log_path=log_path)
+    assert check(plugin) is True
+    assert classifier_results() == {}
+    assert not os.path.exists(log_path)
+    REGISTRY.reset()
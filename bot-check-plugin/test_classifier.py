@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试本地 is_for_bot 分类器
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from bot_check_plugin.classifier import ForBotClassifier, evaluate, train  # noqa: E402
+
+
+def history(*contents):
+    return json.dumps(
+        [{"speaker_name": "a", "content": c, "is_bot": False} for c in contents],
+        ensure_ascii=False,
+    )
+
+
+RECORDS = [
+    {"message": "@机器人 帮我查一下天气", "chat_history": history("帮我查一下天气"), "is_chatroom": True, "is_at": True, "is_for_bot": True},
+    {"message": "机器人你好，讲个笑话", "chat_history": history("讲个笑话"), "is_chatroom": True, "is_at": False, "is_for_bot": True},
+    {"message": "@机器人 翻译一下这句话", "chat_history": history("翻译"), "is_chatroom": True, "is_at": True, "is_for_bot": True},
+    {"message": "晚上一起吃饭吗", "chat_history": history("晚上一起吃饭吗"), "is_chatroom": True, "is_at": False, "is_for_bot": False},
+    {"message": "哈哈哈哈", "chat_history": history("哈哈哈哈"), "is_chatroom": True, "is_at": False, "is_for_bot": False},
+    {"message": "明天几点开会", "chat_history": history("明天几点开会"), "is_chatroom": True, "is_at": False, "is_for_bot": False},
+]
+
+
+def test_train_save_load():
+    model = train(RECORDS, dim=1 << 12, epochs=30)
+    assert evaluate(model, RECORDS, 0.5)["accuracy"] == 1.0
+    assert model.predict_proba("@机器人 帮我写首诗", "", True, True) > 0.5
+    assert model.predict_proba("哈哈 吃饭去", "", True, False) < 0.5
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".npz") as f:
+        path = f.name
+    try:
+        model.save(path)
+        loaded = ForBotClassifier.load(path)
+    finally:
+        os.remove(path)
+    sample = RECORDS[0]
+    assert loaded.predict_sample(loaded.featurize_record(sample)) == pytest.approx(
+        model.predict_sample(model.featurize_record(sample))
+    )
+
+
+def test_predict_large_margin():
+    with np.errstate(all="raise"):
+        assert ForBotClassifier.empty(1 << 8, bias=1e4).predict_proba("你好") == 1.0
+        assert ForBotClassifier.empty(1 << 8, bias=-1e4).predict_proba("你好") == 0.0
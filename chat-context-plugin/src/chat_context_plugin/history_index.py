@@ -0,0 +1,203 @@
+"""
+长期聊天记录索引
+
+按会话维护的倒排索引，存放在本地 SQLite 中，用于检索滑出最近上下文窗口的旧消息：
+- 分词：英文/数字按单词，中日韩文字按相邻二元组（bigram），不依赖分词库
+- 增量写入：每条消息写入一次，倒排表记录词频
+- 检索：BM25 打分，返回 top-k
+- 容量：单会话和总消息数都有上限，超出后删除最早的消息。单会话上限在每次写入时检查，
+  总数每 prune_interval 次写入检查一次，删除后通过 incremental vacuum 归还文件空间
+
+所有方法都是同步的，调用方应在单线程执行器中使用同一个实例。
+"""
+
+import math
+import re
+import sqlite3
+from collections import Counter
+from typing import Dict, List, Optional
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session TEXT NOT NULL,
+    create_time INTEGER NOT NULL,
+    speaker TEXT NOT NULL,
+    content TEXT NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session, id);
+CREATE TABLE IF NOT EXISTS postings (
+    session TEXT NOT NULL,
+    term TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_postings_term ON postings (session, term);
+CREATE INDEX IF NOT EXISTS idx_postings_message ON postings (message_id);
+"""
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    英文/数字按单词切分，连续的中日韩文字切成 bigram，单个汉字保留为一个词
+    """
+    tokens = []
+    for match in _TOKEN_RE.finditer((text or "").lower()):
+        word = match.group()
+        if word.isascii():
+            if len(word) > 1 or word.isdigit():
+                tokens.append(word)
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i : i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+class HistoryIndex:
+    def __init__(
+        self,
+        path: str,
+        max_messages_per_session: int = 5000,
+        max_total_messages: int = 200000,
+        prune_interval: int = 100,
+    ):
+        self.max_messages_per_session = max_messages_per_session
+        self.max_total_messages = max_total_messages
+        self.prune_interval = max(1, prune_interval)
+        self._writes = 0
+        # 会话 -> 消息数，第一次写入该会话时从数据库读取
+        self._session_counts: Dict[str, int] = {}
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # 新文件在建表前设置才生效，已有的文件需要 VACUUM 一次才能切换
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            self.conn.execute("VACUUM")
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(_SCHEMA)
+
+    def _session_count(self, session: str) -> int:
+        count = self._session_counts.get(session)
+        if count is None:
+            (count,) = self.conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE session = ?", (session,)
+            ).fetchone()
+            self._session_counts[session] = count
+        return count
+
+    def add(self, session: str, create_time: int, speaker: str, content: str):
+        tokens = tokenize(content)
+        if not tokens:
+            return
+        count = self._session_count(session)
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO messages (session, create_time, speaker, content, length) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session, int(create_time or 0), speaker, content, len(tokens)),
+            )
+            message_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO postings (session, term, message_id, tf) VALUES (?, ?, ?, ?)",
+                [(session, t, message_id, tf) for t, tf in Counter(tokens).items()],
+            )
+            count += 1
+            if count > self.max_messages_per_session:
+                self._delete_oldest(
+                    "WHERE session = ?", (session,), count - self.max_messages_per_session
+                )
+                count = self.max_messages_per_session
+        self._session_counts[session] = count
+        self._writes += 1
+        if self._writes % self.prune_interval == 0:
+            self.prune()
+
+    def _delete_oldest(self, where: str, params: tuple, count: int):
+        ids = [
+            row[0]
+            for row in self.conn.execute(
+                f"SELECT id FROM messages {where} ORDER BY id LIMIT ?", params + (count,)
+            )
+        ]
+        if not ids:
+            return
+        placeholders = ",".join("?" * len(ids))
+        self.conn.execute(f"DELETE FROM postings WHERE message_id IN ({placeholders})", ids)
+        self.conn.execute(f"DELETE FROM messages WHERE id IN ({placeholders})", ids)
+
+    def prune(self, session: Optional[str] = None):
+        """
+        删除超出容量的最早消息，指定 session 时只检查该会话的上限，否则检查所有会话，
+        之后检查总数上限并归还删除释放的文件空间
+        """
+        with self.conn:
+            if session is not None:
+                over = self.conn.execute(
+                    "SELECT session, COUNT(*) FROM messages WHERE session = ?", (session,)
+                ).fetchall()
+            else:
+                over = self.conn.execute(
+                    "SELECT session, COUNT(*) FROM messages GROUP BY session HAVING COUNT(*) > ?",
+                    (self.max_messages_per_session,),
+                ).fetchall()
+            for name, count in over:
+                if count > self.max_messages_per_session:
+                    self._delete_oldest(
+                        "WHERE session = ?", (name,), count - self.max_messages_per_session
+                    )
+            (total,) = self.conn.execute("SELECT COUNT(*) FROM messages").fetchone()
+            if total > self.max_total_messages:
+                self._delete_oldest("", (), total - self.max_total_messages)
+        # 删除后各会话的消息数不再准确，下次写入时重新读取
+        self._session_counts.clear()
+        self.conn.execute("PRAGMA incremental_vacuum")
+
+    def search(self, session: str, query: str, top_k: int = 5) -> List[dict]:
+        """
+        在会话内检索与 query 最相关的消息，按时间顺序返回
+        """
+        terms = list(set(tokenize(query)))
+        if not terms or top_k <= 0:
+            return []
+        (doc_count, total_length) = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM messages WHERE session = ?",
+            (session,),
+        ).fetchone()
+        if not doc_count:
+            return []
+        avg_length = total_length / doc_count
+        placeholders = ",".join("?" * len(terms))
+        rows = self.conn.execute(
+            f"SELECT p.term, p.message_id, p.tf, m.length FROM postings p "
+            f"JOIN messages m ON m.id = p.message_id "
+            f"WHERE p.session = ? AND p.term IN ({placeholders})",
+            [session, *terms],
+        ).fetchall()
+        df = Counter(term for term, _, _, _ in rows)
+        scores = Counter()
+        for term, message_id, tf, length in rows:
+            idf = math.log(1 + (doc_count - df[term] + 0.5) / (df[term] + 0.5))
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+            scores[message_id] += idf * tf * (BM25_K1 + 1) / norm
+        best = [message_id for message_id, _ in scores.most_common(top_k)]
+        if not best:
+            return []
+        placeholders = ",".join("?" * len(best))
+        return [
+            {"speaker_name": speaker, "content": content, "create_time": create_time}
+            for speaker, content, create_time in self.conn.execute(
+                f"SELECT speaker, content, create_time FROM messages "
+                f"WHERE id IN ({placeholders}) ORDER BY id",
+                best,
+            )
+        ]
+
+    def close(self):
+        self.conn.close()
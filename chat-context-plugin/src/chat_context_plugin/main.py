@@ -1,5 +1,8 @@
+import asyncio
 import json
+import time
 from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from omni_bot_sdk.plugins.interface import (
     Bot,
@@ -8,7 +11,11 @@ from omni_bot_sdk.plugins.interface import (
     PluginExcuteResponse,
     MessageType,
 )
-from pydantic import BaseModel
+from omni_plugin_common.context_keys import CHAT_HISTORY, CHAT_SUMMARY, RELATED_HISTORY
+from omni_plugin_common.dispatch import MessageFilter
+from omni_plugin_common.metrics import instrument_plugin
+from omni_plugin_common.scheduler import conversation_key
+from pydantic import BaseModel, Field
 
 
 class ChatContextPluginConfig(BaseModel):
@@ -16,10 +23,34 @@ class ChatContextPluginConfig(BaseModel):
     上下文插件配置
     enabled: 是否启用该插件
     priority: 插件优先级，数值越大优先级越高
+    history_size: 最近上下文保留的消息条数，至少为 1
+    history_index_path: 长期聊天记录索引的 SQLite 文件路径，为空时不启用
+    history_index_max_messages: 每个会话索引保留的最多消息数
+    history_index_max_total: 索引保留的总消息数
+    history_search_top_k: 检索 related_history 时返回的消息条数
+    summary_enabled: 是否把滑出窗口的消息合并为滚动摘要 chat_summary
+    summary_interval: 每滑出多少条消息更新一次摘要
+    summary_max_chars: 摘要的最大字数
+    summary_openai_api_key: 生成摘要使用的 OpenAI API密钥
+    summary_openai_base_url: 生成摘要使用的 OpenAI API基础URL
+    summary_openai_model: 生成摘要使用的模型名称
+    summary_prompt: 生成摘要的系统提示词，支持 {{max_chars}} 占位符，为空时使用内置提示词
     """
 
     enabled: bool = False
     priority: int = 1001
+    history_size: int = Field(default=20, ge=1)
+    history_index_path: str = ""
+    history_index_max_messages: int = 5000
+    history_index_max_total: int = 200000
+    history_search_top_k: int = 5
+    summary_enabled: bool = False
+    summary_interval: int = 20
+    summary_max_chars: int = 500
+    summary_openai_api_key: str = "unknown"
+    summary_openai_base_url: str = "https://api.openai.com/v1"
+    summary_openai_model: str = "gpt-3.5-turbo"
+    summary_prompt: str = ""
 
 
 class ChatContextPlugin(Plugin):
@@ -36,12 +67,85 @@ class ChatContextPlugin(Plugin):
         self.user = bot.user_info
         # 动态优先级支持
         self.priority = getattr(self.plugin_config, "priority", self.__class__.priority)
+        # TODO 目前只维护了文本消息，其他消息类型暂时忽略
+        self.message_filter = MessageFilter(
+            message_types=(MessageType.Text, MessageType.Quote)
+        )
+        self.enabled = self.plugin_config.enabled
+        self.history_size = self.plugin_config.history_size
+        self.history_search_top_k = self.plugin_config.history_search_top_k
+        self.history_index = None
+        self._index_executor = None
+        if self.enabled and self.plugin_config.history_index_path:
+            from .history_index import HistoryIndex
+
+            # sqlite 连接只在这一个线程中使用，写入和检索都不阻塞事件循环
+            self._index_executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="history-index"
+            )
+            self.history_index = self._index_executor.submit(
+                HistoryIndex,
+                self.plugin_config.history_index_path,
+                self.plugin_config.history_index_max_messages,
+                self.plugin_config.history_index_max_total,
+            ).result()
+        self.summarizer = None
+        if self.enabled and self.plugin_config.summary_enabled:
+            # openai 只有启用摘要时才导入
+            from .summarizer import DEFAULT_SUMMARY_PROMPT, RollingSummarizer
+
+            self.summarizer = RollingSummarizer(
+                api_key=self.plugin_config.summary_openai_api_key,
+                base_url=self.plugin_config.summary_openai_base_url,
+                model=self.plugin_config.summary_openai_model,
+                interval=self.plugin_config.summary_interval,
+                max_chars=self.plugin_config.summary_max_chars,
+                prompt=self.plugin_config.summary_prompt or DEFAULT_SUMMARY_PROMPT,
+                owner=self.name,
+                logger=self.logger,
+            )
 
     def _get_session_messages(self, session_id):
         if session_id not in self.session_messages:
-            self.session_messages[session_id] = deque(maxlen=20)
+            # 元素为 (消息时间, 格式化后的消息)
+            self.session_messages[session_id] = deque(maxlen=self.history_size)
         return self.session_messages[session_id]
 
+    def _on_evicted(self, session_id, create_time, formatted_message):
+        """
+        消息滑出最近上下文窗口，交给长期索引和滚动摘要
+        """
+        if self.summarizer:
+            self.summarizer.add_evicted(session_id, formatted_message)
+        if not self.history_index:
+            return
+        future = self._index_executor.submit(
+            self.history_index.add,
+            session_id,
+            create_time,
+            formatted_message["speaker_name"],
+            formatted_message["content"],
+        )
+        future.add_done_callback(self._log_index_error)
+
+    def _log_index_error(self, future):
+        if future.exception():
+            self.logger.error(f"写入聊天记录索引失败: {future.exception()}")
+
+    def _search_related(self, session_id, query):
+        results = self.history_index.search(session_id, query, self.history_search_top_k)
+        for item in results:
+            item["time"] = time.strftime(
+                "%Y-%m-%d %H:%M:%S", time.localtime(item.pop("create_time"))
+            )
+        return json.dumps(results, ensure_ascii=False) if results else ""
+
+    async def _related_history(self, session_id, query):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._index_executor, self._search_related, session_id, query
+        )
+
     def _format_message(self, message):
         sender = self.user.nickname if message.is_self else message.contact.display_name
         content = (
@@ -55,32 +159,42 @@ class ChatContextPlugin(Plugin):
             "is_bot": message.is_self,
         }
 
-    def _build_chat_history(self, session_id):
-        messages = self._get_session_messages(session_id)
+    def _build_chat_history(self, messages):
         if not messages:
             return ""
-        return json.dumps(list(messages), ensure_ascii=False)
+        return json.dumps(messages, ensure_ascii=False)
 
     def get_priority(self) -> int:
         return self.priority
 
+    def get_message_filter(self) -> MessageFilter:
+        return self.message_filter
+
+    @instrument_plugin
     async def handle_message(self, plusginExcuteContext: PluginExcuteContext) -> None:
         message = plusginExcuteContext.get_message()
-        context = plusginExcuteContext.get_context()
-        # TODO 目前只维护了文本消息，其他消息类型暂时忽略
-        if (
-            message.local_type != MessageType.Text
-            and message.local_type != MessageType.Quote
-        ):
+        if not self.message_filter.matches(message):
             return
-        target = (
-            message.room.username if message.is_chatroom else message.contact.username
-        )
+        target = conversation_key(message)
         session_messages = self._get_session_messages(target)
         formatted_message = self._format_message(message)
-        session_messages.append(formatted_message)
-        chat_history = self._build_chat_history(target)
-        context["chat_history"] = chat_history
+        if len(session_messages) == session_messages.maxlen:
+            self._on_evicted(target, *session_messages[0])
+        session_messages.append((message.create_time, formatted_message))
+        # 保存当前的快照，序列化推迟到后续插件真正读取 chat_history 时
+        snapshot = [m for _, m in session_messages]
+        CHAT_HISTORY.provide(
+            plusginExcuteContext, lambda: self._build_chat_history(snapshot), owner=self.name
+        )
+        if self.summarizer:
+            CHAT_SUMMARY.set(plusginExcuteContext, self.summarizer.get(target))
+        if self.history_index:
+            # 只有 prompt 中用到 related_history 时才会检索
+            RELATED_HISTORY.provide(
+                plusginExcuteContext,
+                lambda: self._related_history(target, formatted_message["content"]),
+                owner=self.name,
+            )
         # 不再调用 dify 判断是否 for bot，只维护上下文
         return
 
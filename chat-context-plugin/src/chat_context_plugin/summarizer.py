@@ -0,0 +1,114 @@
+"""
+滚动摘要
+
+滑出最近上下文窗口的消息先放入会话的待摘要列表，累计到 interval 条后，
+在后台任务中把旧摘要和这些消息交给大模型合并成新的摘要，消息处理流程中只做一次列表追加。
+同一会话同时最多只有一个摘要任务，任务执行期间新滑出的消息留到下一次。
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from omni_plugin_common.ledger import LEDGER
+from omni_plugin_common.metrics import track_call
+
+DEFAULT_SUMMARY_PROMPT = (
+    "你负责维护一个群聊的长期记忆。下面给出已有的摘要和之后的新消息，"
+    "请把新消息合并进摘要，保留人物、约定、结论和未解决的问题，删去寒暄。"
+    "只输出新的摘要，不超过 {{max_chars}} 字。"
+)
+
+
+class RollingSummarizer:
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str,
+        model: str,
+        interval: int = 20,
+        max_chars: int = 500,
+        prompt: str = DEFAULT_SUMMARY_PROMPT,
+        owner: str = "chat-context-plugin",
+        logger: Optional[logging.Logger] = None,
+        client: Any = None,
+    ):
+        """
+        client: 兼容 openai.OpenAI 的同步客户端，为空时按 api_key / base_url 创建
+        """
+        if client is None:
+            import openai
+
+            client = openai.OpenAI(api_key=api_key, base_url=base_url)
+        self.client = client
+        self.model = model
+        self.interval = max(1, interval)
+        self.max_chars = max_chars
+        self.prompt = prompt
+        self.owner = owner
+        self.logger = logger or logging.getLogger(__name__)
+        self.summaries: Dict[str, str] = {}
+        self._pending: Dict[str, List[dict]] = {}
+        self._running: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def get(self, session: str) -> str:
+        return self.summaries.get(session, "")
+
+    def add_evicted(self, session: str, message: dict):
+        """
+        记录滑出窗口的消息，攒够 interval 条后启动后台摘要
+        """
+        pending = self._pending.setdefault(session, [])
+        pending.append(message)
+        if len(pending) >= self.interval and session not in self._running:
+            self._running.add(session)
+            batch = self._pending.pop(session)
+            task = asyncio.create_task(self._refresh(session, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _summarize(self, session: str, previous: str, messages: List[dict]) -> str:
+        system_prompt = self.prompt.replace("{{max_chars}}", str(self.max_chars))
+        user_content = (
+            f"已有摘要：{previous or '无'}\n"
+            f"新消息：{json.dumps(messages, ensure_ascii=False)}"
+        )
+        with track_call(self.owner, "openai_summary"), LEDGER.call(
+            session, self.model, f"{self.owner}/summary"
+        ) as entry:
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_content},
+                ],
+            )
+            if response.usage:
+                entry.set_usage(
+                    response.usage.prompt_tokens,
+                    response.usage.completion_tokens,
+                    response.usage.total_tokens,
+                )
+        return (response.choices[0].message.content or "").strip()
+
+    async def _refresh(self, session: str, batch: List[dict]):
+        try:
+            summary = await asyncio.to_thread(
+                self._summarize, session, self.summaries.get(session, ""), batch
+            )
+            if summary:
+                self.summaries[session] = summary
+        except Exception as e:
+            self.logger.warning(f"会话 {session} 生成摘要失败: {e}")
+            # 放回待摘要列表，下次与新消息一起重试，持续失败时只保留最近的部分
+            pending = batch + self._pending.get(session, [])
+            self._pending[session] = pending[-self.interval * 5 :]
+        finally:
+            self._running.discard(session)
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
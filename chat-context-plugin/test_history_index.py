@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试长期聊天记录索引
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from chat_context_plugin.history_index import HistoryIndex, tokenize  # noqa: E402
+
+
+def test_tokenize():
+    assert tokenize("Hello 世界杯 a 1") == ["hello", "世界", "界杯", "1"]
+    assert tokenize("好") == ["好"]
+
+
+def test_search_and_prune():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = HistoryIndex(
+            os.path.join(tmp, "history.db"),
+            max_messages_per_session=3,
+            prune_interval=1,
+        )
+        index.add("room", 1, "张三", "周末一起去爬山吧")
+        index.add("room", 2, "李四", "今天的会议改到下午三点")
+        index.add("room", 3, "王五", "爬山要带水和登山杖")
+        index.add("other", 4, "赵六", "爬山")
+        results = index.search("room", "爬山带什么", top_k=2)
+        assert [r["create_time"] for r in results] == [1, 3]
+        assert index.search("room", "", top_k=2) == []
+
+        index.add("room", 5, "张三", "会议纪要发群里了")
+        # 超出单会话上限，最早的一条被删除
+        assert [r["create_time"] for r in index.search("room", "爬山", top_k=5)] == [3]
+        index.close()
+
+
+def test_session_cap_and_vacuum():
+    with tempfile.TemporaryDirectory() as tmp:
+        index = HistoryIndex(
+            os.path.join(tmp, "history.db"),
+            max_messages_per_session=3,
+            prune_interval=1000,
+        )
+        for i in range(10):
+            index.add("room", i, "张三", f"爬山计划第{i}版")
+            index.add("other", i, "李四", f"会议纪要第{i}版")
+        # 没有到 prune_interval，每个会话仍然不超过上限
+        for session in ("room", "other"):
+            (count,) = index.conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE session = ?", (session,)
+            ).fetchone()
+            assert count == 3
+
+        for i in range(200):
+            index.add("big", i, "王五", "很长的消息" * 50)
+        index.max_messages_per_session = 1
+        index.prune()
+        assert index.conn.execute("SELECT COUNT(*) FROM messages").fetchone() == (3,)
+        assert index.conn.execute("PRAGMA auto_vacuum").fetchone() == (2,)
+        assert index.conn.execute("PRAGMA freelist_count").fetchone() == (0,)
+        index.close()
+
+
+if __name__ == "__main__":
+    test_tokenize()
+    test_search_and_prune()
+    test_session_cap_and_vacuum()
+    print("全部测试通过")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试滚动摘要
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "omni-plugin-common", "src"))
+
+from chat_context_plugin.summarizer import RollingSummarizer  # noqa: E402
+
+
+class FakeClient:
+    """
+    按顺序返回结果的同步客户端，结果为异常时抛出，release 被 set 前调用会阻塞
+    """
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.calls = []
+        self.release = None
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model, messages):
+        if self.release is not None:
+            self.release.wait(5)
+        self.calls.append(messages[-1]["content"])
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return SimpleNamespace(
+            usage=None, choices=[SimpleNamespace(message=SimpleNamespace(content=result))]
+        )
+
+
+def make_summarizer(client, interval=2):
+    return RollingSummarizer("", "", "model", interval=interval, client=client)
+
+
+async def _drain(summarizer):
+    while summarizer._tasks:
+        await asyncio.gather(*list(summarizer._tasks))
+
+
+def test_refresh_every_interval():
+    async def run():
+        client = FakeClient(["摘要1", "摘要2"])
+        summarizer = make_summarizer(client, interval=2)
+        summarizer.add_evicted("room", {"content": "a"})
+        await asyncio.sleep(0)
+        assert not client.calls and summarizer.get("room") == ""
+        summarizer.add_evicted("room", {"content": "b"})
+        await _drain(summarizer)
+        assert summarizer.get("room") == "摘要1"
+        summarizer.add_evicted("room", {"content": "c"})
+        summarizer.add_evicted("room", {"content": "d"})
+        await _drain(summarizer)
+        assert summarizer.get("room") == "摘要2"
+        # 第二次摘要带上了已有摘要
+        assert len(client.calls) == 2 and "摘要1" in client.calls[1]
+
+    asyncio.run(run())
+
+
+def test_one_refresh_in_flight_per_session():
+    async def run():
+        client = FakeClient(["摘要1", "摘要2"])
+        client.release = threading.Event()
+        summarizer = make_summarizer(client, interval=2)
+        for content in "abcdef":
+            summarizer.add_evicted("room", {"content": content})
+        await asyncio.sleep(0)
+        # 第一次摘要还没完成，之后滑出的消息留到下一次
+        assert len(summarizer._tasks) == 1
+        assert [m["content"] for m in summarizer._pending["room"]] == list("cdef")
+        client.release.set()
+        await _drain(summarizer)
+        assert len(client.calls) == 1 and summarizer.get("room") == "摘要1"
+        # 下一条消息触发时一起摘要
+        summarizer.add_evicted("room", {"content": "g"})
+        await _drain(summarizer)
+        assert len(client.calls) == 2 and '"g"' in client.calls[1] and '"c"' in client.calls[1]
+
+    asyncio.run(run())
+
+
+def test_failed_refresh_keeps_and_trims_backlog():
+    async def run():
+        client = FakeClient([RuntimeError("boom")] * 3)
+        summarizer = make_summarizer(client, interval=2)
+        summarizer.add_evicted("room", {"content": "a"})
+        summarizer.add_evicted("room", {"content": "b"})
+        await _drain(summarizer)
+        # 失败的消息放回待摘要列表
+        assert [m["content"] for m in summarizer._pending["room"]] == ["a", "b"]
+        assert summarizer.get("room") == ""
+
+        # 持续失败时只保留最近 interval * 5 条
+        for i in range(20):
+            summarizer._pending["room"].append({"content": str(i)})
+        summarizer.add_evicted("room", {"content": "last"})
+        await _drain(summarizer)
+        pending = summarizer._pending["room"]
+        assert len(pending) == 10 and pending[-1]["content"] == "last"
+
+    asyncio.run(run())
@@ -0,0 +1,115 @@
+import threading
+
+from omni_bot_sdk.plugins.interface import (
+    Bot,
+    Plugin,
+    PluginExcuteContext,
+)
+from omni_plugin_common.dedup import (
+    TimeBucketedBloomFilter,
+    message_identity,
+    record_result,
+)
+from omni_plugin_common.dispatch import MessageFilter
+from omni_plugin_common.metrics import instrument_plugin
+from pydantic import BaseModel
+
+
+class DedupPluginConfig(BaseModel):
+    """
+    重复消息过滤插件配置
+    enabled: 是否启用该插件
+    priority: 插件优先级，数值越大优先级越高，需要高于其他插件
+    window_seconds: 去重的时间窗口（秒）
+    capacity: 一个时间窗口内预计的消息数，超出后误判率会升高
+    error_rate: 目标误判率，误判时正常消息会被当作重复消息丢弃
+    buckets: 时间窗口分成的桶数，桶越多过期越平滑
+    persist_path: 保存去重记录的文件，重启后继续使用，为空时不保存
+    persist_interval: 保存间隔（秒）
+    """
+
+    enabled: bool = False
+    priority: int = 2000
+    window_seconds: int = 3600
+    capacity: int = 100000
+    error_rate: float = 0.001
+    buckets: int = 6
+    persist_path: str = ""
+    persist_interval: int = 60
+
+
+class DedupPlugin(Plugin):
+    """
+    重复消息过滤插件
+    在所有插件之前执行，同一条消息第二次出现时停止后续插件，避免重复回复
+    """
+
+    priority = 2000
+    name = "dedup-plugin"
+
+    def __init__(self, bot: "Bot"):
+        super().__init__(bot)
+        self.enabled = self.plugin_config.enabled
+        # 动态优先级支持
+        self.priority = getattr(self.plugin_config, "priority", self.__class__.priority)
+        self.message_filter = MessageFilter()
+        self.persist_path = self.plugin_config.persist_path
+        self.seen = None
+        self.persist_stop_event = None
+        if not self.enabled:
+            return
+        self.seen = TimeBucketedBloomFilter(
+            capacity=self.plugin_config.capacity,
+            error_rate=self.plugin_config.error_rate,
+            window_seconds=self.plugin_config.window_seconds,
+            buckets=self.plugin_config.buckets,
+        )
+        self.logger.info(f"去重过滤器占用内存 {self.seen.memory_bytes // 1024} KB")
+        if self.persist_path:
+            if self.seen.load(self.persist_path):
+                self.logger.info(f"已加载去重记录: {self.persist_path}")
+            self.persist_stop_event = self._start_persist(self.plugin_config.persist_interval)
+
+    def _start_persist(self, interval: float) -> threading.Event:
+        stop_event = threading.Event()
+
+        def _run():
+            while not stop_event.wait(interval):
+                try:
+                    self.seen.save(self.persist_path)
+                except OSError as e:
+                    self.logger.warning(f"保存去重记录失败: {e}")
+
+        threading.Thread(target=_run, name="dedup-persist", daemon=True).start()
+        return stop_event
+
+    def get_priority(self) -> int:
+        return self.priority
+
+    def get_message_filter(self) -> MessageFilter:
+        return self.message_filter
+
+    @instrument_plugin
+    async def handle_message(self, plusginExcuteContext: PluginExcuteContext) -> None:
+        if not self.enabled:
+            return
+        message = plusginExcuteContext.get_message()
+        identity = message_identity(message)
+        duplicate = self.seen.check_and_add(identity)
+        record_result("message", duplicate, self.seen)
+        if duplicate:
+            self.logger.info(f"重复消息，停止处理: {identity}")
+            plusginExcuteContext.should_stop = True
+
+    def get_plugin_name(self) -> str:
+        return self.name
+
+    def get_plugin_description(self) -> str:
+        return "这是一个过滤重复投递消息的插件"
+
+    @classmethod
+    def get_plugin_config_schema(cls):
+        """
+        返回插件配置的pydantic schema类。
+        """
+        return DedupPluginConfig
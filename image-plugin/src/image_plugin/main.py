@@ -11,6 +11,8 @@ from omni_bot_sdk.plugins.interface import (
     DownloadImageAction,
     MessageType,
 )
+from omni_plugin_common.dispatch import MessageFilter
+from omni_plugin_common.metrics import instrument_plugin
 
 
 class ImagePluginConfig(BaseModel):
@@ -38,15 +40,20 @@ class ImagePlugin(Plugin):
         self.enabled = self.plugin_config.enabled
         # 动态优先级支持
         self.priority = getattr(self.plugin_config, "priority", self.__class__.priority)
+        self.message_filter = MessageFilter(message_types=(MessageType.Image,))
 
     def get_priority(self) -> int:
         return self.priority
 
+    def get_message_filter(self) -> MessageFilter:
+        return self.message_filter
+
+    @instrument_plugin
     async def handle_message(self, context: PluginExcuteContext) -> None:
         if not self.enabled:
             return
         message = context.get_message()
-        if message.local_type == MessageType.Image:
+        if self.message_filter.matches(message):
             # image_path = os.path.join(self.data_dir, message.path)
             # TODO 这个可能会从数据库查询，是有问题的
             filename = f"{message.file_name}.dat"
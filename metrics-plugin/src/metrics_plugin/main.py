@@ -0,0 +1,101 @@
+from omni_bot_sdk.plugins.interface import (
+    Bot,
+    Plugin,
+    PluginExcuteContext,
+)
+from omni_plugin_common.dispatch import MessageFilter
+from omni_plugin_common.ledger import LEDGER, start_ledger_flusher
+from omni_plugin_common.metrics import (
+    REGISTRY,
+    start_prometheus_server,
+    start_summary_logger,
+)
+from pydantic import BaseModel
+
+
+class MetricsPluginConfig(BaseModel):
+    """
+    指标导出插件配置
+    enabled: 是否启用该插件
+    priority: 插件优先级，数值越大优先级越高
+    prometheus_port: Prometheus 指标端口，0 表示不启动
+    prometheus_host: Prometheus 指标监听地址
+    log_interval: 定期输出指标摘要的间隔（秒），0 表示不输出
+    ledger_path: 大模型调用账本文件，.csv 结尾写 CSV，否则写 SQLite，为空时不写入
+    ledger_flush_interval: 账本写入间隔（秒）
+    """
+
+    enabled: bool = False
+    priority: int = 0
+    prometheus_port: int = 0
+    prometheus_host: str = "127.0.0.1"
+    log_interval: int = 300
+    ledger_path: str = ""
+    ledger_flush_interval: int = 60
+
+
+class MetricsPlugin(Plugin):
+    """
+    指标导出插件
+    各插件通过 omni_plugin_common.metrics 记录耗时和计数，本插件只负责导出
+    """
+
+    priority = 0
+    name = "metrics-plugin"
+
+    def __init__(self, bot: "Bot"):
+        super().__init__(bot)
+        # 动态优先级支持
+        self.priority = getattr(self.plugin_config, "priority", self.__class__.priority)
+        self.server = None
+        self.summary_stop_event = None
+        self.ledger_stop_event = None
+        self.enabled = self.plugin_config.enabled
+        if not self.enabled:
+            return
+        if self.plugin_config.prometheus_port:
+            self.server = start_prometheus_server(
+                self.plugin_config.prometheus_port, self.plugin_config.prometheus_host
+            )
+            self.logger.info(
+                f"指标服务已启动: {self.plugin_config.prometheus_host}:{self.plugin_config.prometheus_port}"
+            )
+        if self.plugin_config.log_interval > 0:
+            self.summary_stop_event = start_summary_logger(
+                self.logger, self.plugin_config.log_interval
+            )
+        if self.plugin_config.ledger_path:
+            self.ledger_stop_event = start_ledger_flusher(
+                LEDGER,
+                self.plugin_config.ledger_path,
+                self.plugin_config.ledger_flush_interval,
+                self.logger,
+            )
+            self.logger.info(f"大模型调用账本写入: {self.plugin_config.ledger_path}")
+
+    def get_priority(self) -> int:
+        return self.priority
+
+    def get_message_filter(self) -> MessageFilter:
+        # 不处理任何消息，分发时直接跳过
+        return MessageFilter(message_types=())
+
+    def render_metrics(self) -> str:
+        return REGISTRY.render_prometheus()
+
+    async def handle_message(self, context: PluginExcuteContext) -> None:
+        # 只负责导出，不处理消息
+        return
+
+    def get_plugin_name(self) -> str:
+        return self.name
+
+    def get_plugin_description(self) -> str:
+        return "这是一个用于导出插件耗时和吞吐指标的插件"
+
+    @classmethod
+    def get_plugin_config_schema(cls):
+        """
+        返回插件配置的pydantic schema类。
+        """
+        return MetricsPluginConfig
@@ -0,0 +1,73 @@
+"""
+过期消息丢弃和积压时的降载
+
+断线重连或者故障恢复后，积压的旧消息会依次经过整个插件链，
+大模型回复、欢迎海报这类工作对过时的消息已经没有意义。
+插件通过 AdmissionPolicy 声明自己能接受的消息：
+
+- max_age: 消息创建超过多少秒后不再处理，0 表示不限制
+- max_backlog: 调度器中积压的消息达到多少条时不再处理，0 表示不限制，
+  需要通过 install_scheduler 安装按会话调度，否则积压数始终为 0
+
+被丢弃的消息按插件和原因计数到 omni_plugin_shed_total。
+只应该用在产生回复、下载等"可以不做"的插件上，chat-context 这类维护状态的插件仍然要处理每条消息。
+
+    self.admission = AdmissionPolicy(max_age=60, max_backlog=200)
+    if not self.admission.admit(self.name, message):
+        return
+"""
+
+import logging
+import time
+from typing import Optional
+
+from .metrics import REGISTRY
+from .scheduler import total_pending
+
+SHED_TOTAL = "omni_plugin_shed_total"
+REASON_STALE = "stale"
+REASON_BACKLOG = "backlog"
+
+logger = logging.getLogger(__name__)
+
+
+def message_age(message, now: Optional[float] = None) -> float:
+    """
+    消息创建到现在的秒数，没有 create_time 时视为刚收到
+    """
+    create_time = getattr(message, "create_time", None)
+    if not create_time:
+        return 0.0
+    return (time.time() if now is None else now) - create_time
+
+
+class AdmissionPolicy:
+    __slots__ = ("max_age", "max_backlog")
+
+    def __init__(self, max_age: float = 0, max_backlog: int = 0):
+        self.max_age = max_age
+        self.max_backlog = max_backlog
+
+    def __repr__(self):
+        return f"AdmissionPolicy(max_age={self.max_age}, max_backlog={self.max_backlog})"
+
+    def reason(self, message, now: Optional[float] = None) -> Optional[str]:
+        """
+        返回不处理的原因，可以处理时返回 None
+        """
+        if self.max_age > 0 and message_age(message, now) > self.max_age:
+            return REASON_STALE
+        if self.max_backlog > 0 and total_pending() >= self.max_backlog:
+            return REASON_BACKLOG
+        return None
+
+    def admit(self, plugin_name: str, message, now: Optional[float] = None) -> bool:
+        reason = self.reason(message, now)
+        if reason is None:
+            return True
+        REGISTRY.inc(SHED_TOTAL, (("plugin", plugin_name), ("reason", reason)))
+        logger.debug(f"[{plugin_name}] 丢弃消息 {getattr(message, 'local_id', '')}: {reason}")
+        return False
+
+
+ADMIT_ALL = AdmissionPolicy()
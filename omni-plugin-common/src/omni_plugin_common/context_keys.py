@@ -0,0 +1,191 @@
+"""
+插件共享的上下文 key
+
+插件之间通过 PluginExcuteContext.get_context() 返回的 dict 交换数据。
+这里把 key 统一声明为带类型和默认值的 ContextKey，并支持惰性生产：
+
+    # 生产者只登记计算方法，不立即计算
+    CHAT_HISTORY.provide(plusginExcuteContext, lambda: json.dumps(...), owner=self.name)
+
+    # 消费者第一次读取时才计算，同一条消息最多计算一次，耗时记录到 metrics
+    chat_history = CHAT_HISTORY.get(plusginExcuteContext)
+    not_for_bot = await NOT_FOR_BOT.aget(plusginExcuteContext)
+
+生产者挂在 PluginExcuteContext 对象上，不写入 context dict，消息处理完、
+PluginExcuteContext 被释放时一起释放，不需要额外清理。
+惰性的值在被读取之前不会出现在 dict 中，直接 context.get(...) 读不到，
+需要使用 ContextKey.get / aget。只读写普通值时也可以直接传入 context dict。
+"""
+
+import asyncio
+import inspect
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, Type, TypeVar
+
+from .metrics import track_call
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+# PluginExcuteContext 上保存生产者的属性名
+_PRODUCERS_ATTR = "_omni_context_producers"
+
+
+class _Producer:
+    __slots__ = ("func", "owner", "future")
+
+    def __init__(self, func: Callable, owner: str):
+        self.func = func
+        self.owner = owner
+        self.future: Optional[asyncio.Future] = None
+
+
+def _resolve(context, create: bool = False) -> Tuple[dict, Dict[str, _Producer]]:
+    """
+    返回 (context dict, 生产者)，传入 context dict 时没有生产者
+    """
+    if isinstance(context, dict):
+        if create:
+            raise TypeError("登记惰性生产者需要传入 PluginExcuteContext")
+        return context, {}
+    producers = getattr(context, _PRODUCERS_ATTR, None)
+    if producers is None:
+        producers = {}
+        if create:
+            setattr(context, _PRODUCERS_ATTR, producers)
+    return context.get_context(), producers
+
+
+class ContextKey(Generic[T]):
+    """
+    带类型的上下文 key
+    """
+
+    __slots__ = ("name", "type", "default", "description")
+
+    def __init__(self, name: str, type_: Type, default: Any = None, description: str = ""):
+        self.name = name
+        self.type = type_
+        self.default = default
+        self.description = description
+
+    def __repr__(self):
+        return f"ContextKey({self.name!r}, {getattr(self.type, '__name__', self.type)})"
+
+    def set(self, context, value: T):
+        values, producers = _resolve(context)
+        values[self.name] = value
+        producers.pop(self.name, None)
+
+    def provide(self, context, producer: Callable[[], Any], owner: str = ""):
+        """
+        登记惰性生产者，producer 可以是普通函数或 async 函数，context 必须是 PluginExcuteContext
+        """
+        values, producers = _resolve(context, create=True)
+        values.pop(self.name, None)
+        producers[self.name] = _Producer(producer, owner)
+
+    def is_available(self, context) -> bool:
+        values, producers = _resolve(context)
+        return self.name in values or self.name in producers
+
+    def is_pending(self, context) -> bool:
+        """
+        已登记生产者但还没有计算出结果
+        """
+        values, producers = _resolve(context)
+        return self.name not in values and self.name in producers
+
+    def _store(self, context, value):
+        values, producers = _resolve(context)
+        values[self.name] = value
+        producers.pop(self.name, None)
+        return value
+
+    def get(self, context, default: Any = _MISSING) -> T:
+        """
+        同步读取，只能解析同步的生产者
+        """
+        values, producers = _resolve(context)
+        if self.name in values:
+            return values[self.name]
+        producer = producers.get(self.name)
+        if producer is None:
+            return self.default if default is _MISSING else default
+        if producer.future is not None or inspect.iscoroutinefunction(producer.func):
+            raise RuntimeError(f"{self.name} 是异步生产者，请使用 aget 读取")
+        with track_call(producer.owner or "context", f"context:{self.name}"):
+            value = producer.func()
+        if inspect.isawaitable(value):
+            if inspect.iscoroutine(value):
+                value.close()
+            raise RuntimeError(f"{self.name} 是异步生产者，请使用 aget 读取")
+        return self._store(context, value)
+
+    async def aget(self, context, default: Any = _MISSING) -> T:
+        """
+        异步读取，并发读取同一个 key 时共享同一次计算
+        """
+        values, producers = _resolve(context)
+        if self.name in values:
+            return values[self.name]
+        producer = producers.get(self.name)
+        if producer is None:
+            return self.default if default is _MISSING else default
+        if producer.future is None:
+            producer.future = asyncio.ensure_future(self._run(producer))
+        value = await asyncio.shield(producer.future)
+        return self._store(context, value)
+
+    async def _run(self, producer: _Producer):
+        with track_call(producer.owner or "context", f"context:{self.name}"):
+            value = producer.func()
+            if inspect.isawaitable(value):
+                value = await value
+        return value
+
+
+CONTEXT_KEYS: Dict[str, ContextKey] = {}
+
+
+def register_key(
+    name: str, type_: Type, default: Any = None, description: str = ""
+) -> ContextKey:
+    """
+    声明一个上下文 key，同名 key 只能以相同类型重复声明
+    """
+    existing = CONTEXT_KEYS.get(name)
+    if existing is not None:
+        if existing.type is not type_:
+            raise ValueError(
+                f"上下文 key {name} 已声明为 {existing.type}，不能再声明为 {type_}"
+            )
+        return existing
+    key = CONTEXT_KEYS[name] = ContextKey(name, type_, default, description)
+    return key
+
+
+USER = register_key("user", object, None, "当前登录的用户信息，由 SDK 写入")
+CHAT_HISTORY = register_key(
+    "chat_history", str, "", "最近的聊天记录 json 字符串，chat-context-plugin 生产"
+)
+RELATED_HISTORY = register_key(
+    "related_history",
+    str,
+    "",
+    "从长期聊天记录中检索到的相关消息 json 字符串，chat-context-plugin 生产",
+)
+CHAT_SUMMARY = register_key(
+    "chat_summary", str, "", "更早聊天记录的滚动摘要，chat-context-plugin 生产"
+)
+BOT_CHECK = register_key("bot_check", bool, False, "是否经过了 bot-check-plugin 判断")
+NOT_FOR_BOT = register_key(
+    "not_for_bot", bool, False, "消息不是发给机器人的，bot-check-plugin 生产"
+)
+VIDEO_METADATA = register_key(
+    "video_metadata",
+    dict,
+    None,
+    "视频元数据，video-plugin 生产，只有处理消息时视频已经下载才有值，"
+    "否则通过 VideoPlugin.wait_video_metadata 按路径获取",
+)
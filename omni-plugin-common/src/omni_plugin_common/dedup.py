@@ -0,0 +1,237 @@
+"""
+重复消息过滤
+
+断线重连、数据库重复轮询会把同一条消息再次投递，同一个加群事件也可能以 JSON 和纯文本两种形式出现，
+导致重复的 AI 回复、拍一拍和欢迎海报。这里提供按时间分桶的 Bloom filter：
+
+- 每个桶覆盖 window_seconds / buckets 秒，只保留最近 buckets 个桶，内存大小固定（memory_bytes）
+- 查询检查所有保留的桶，写入只写当前桶，超过窗口的记录随桶一起过期
+- 可以保存到文件，重启后继续使用未过期的桶
+- false_positive_rate() 按各桶的置位比例估算当前的误判率
+
+事件量小、误判代价高的场景（例如加群欢迎）使用精确的 RecentKeys。
+
+    seen = TimeBucketedBloomFilter(capacity=100000, error_rate=0.001, window_seconds=3600)
+    if seen.check_and_add(message_identity(message)):
+        return  # 重复消息
+"""
+
+import hashlib
+import json
+import math
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+from .metrics import REGISTRY, _labels
+from .scheduler import conversation_key
+
+DEDUP_TOTAL = "omni_plugin_dedup_total"
+DEDUP_FALSE_POSITIVE_RATE = "omni_plugin_dedup_false_positive_rate"
+
+_MAGIC = b"OBF1"
+
+
+def message_identity(message) -> str:
+    """
+    消息的稳定标识，优先使用服务端消息 id，没有时用会话、类型、时间和内容的摘要
+    """
+    server_id = getattr(message, "server_id", 0)
+    if server_id:
+        return f"s:{server_id}"
+    content = getattr(message, "content", None) or getattr(message, "parsed_content", "")
+    digest = hashlib.blake2b(str(content).encode("utf-8"), digest_size=8).hexdigest()
+    return (
+        f"c:{conversation_key(message)}:{message.local_type}:"
+        f"{getattr(message, 'create_time', 0)}:{digest}"
+    )
+
+
+class _Bucket:
+    __slots__ = ("epoch", "bits", "set_bits", "added")
+
+    def __init__(self, epoch: int, size_bytes: int, bits: Optional[bytearray] = None):
+        self.epoch = epoch
+        self.bits = bits if bits is not None else bytearray(size_bytes)
+        self.set_bits = sum(bin(b).count("1") for b in self.bits) if bits else 0
+        self.added = 0
+
+
+class TimeBucketedBloomFilter:
+    def __init__(
+        self,
+        capacity: int = 100000,
+        error_rate: float = 0.001,
+        window_seconds: float = 3600,
+        buckets: int = 6,
+    ):
+        """
+        capacity: 一个窗口内预计的消息数
+        error_rate: 容量以内时整个窗口的目标误判率
+        """
+        self.buckets = max(1, buckets)
+        self.span = window_seconds / self.buckets
+        # 断线恢复时消息会集中在同一个桶里，每个桶都按整个窗口的容量分配
+        per_bucket = max(1, capacity)
+        # 查询会检查所有桶，每个桶分摊目标误判率
+        p = error_rate / self.buckets
+        bits = math.ceil(-per_bucket * math.log(p) / math.log(2) ** 2)
+        self.size_bytes = (bits + 7) // 8
+        self.m = self.size_bytes * 8
+        self.k = max(1, round(self.m / per_bucket * math.log(2)))
+        self._buckets: List[_Bucket] = []
+        self._lock = threading.Lock()
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.size_bytes * self.buckets
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        h2 |= 1
+        return [(h1 + i * h2) % self.m for i in range(self.k)]
+
+    def _rotate(self, now: float) -> _Bucket:
+        epoch = int(now // self.span)
+        self._buckets = [b for b in self._buckets if b.epoch > epoch - self.buckets]
+        if not self._buckets or self._buckets[-1].epoch != epoch:
+            self._buckets.append(_Bucket(epoch, self.size_bytes))
+        return self._buckets[-1]
+
+    def _contains(self, positions) -> bool:
+        for bucket in self._buckets:
+            bits = bucket.bits
+            if all(bits[p >> 3] & (1 << (p & 7)) for p in positions):
+                return True
+        return False
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._rotate(time.time())
+            return self._contains(self._positions(key))
+
+    def check_and_add(self, key: str, now: Optional[float] = None) -> bool:
+        """
+        返回 key 是否已经出现过（可能误判），没有出现过时写入当前桶
+        """
+        positions = self._positions(key)
+        with self._lock:
+            current = self._rotate(time.time() if now is None else now)
+            if self._contains(positions):
+                return True
+            bits = current.bits
+            for p in positions:
+                mask = 1 << (p & 7)
+                if not bits[p >> 3] & mask:
+                    bits[p >> 3] |= mask
+                    current.set_bits += 1
+            current.added += 1
+            return False
+
+    def false_positive_rate(self) -> float:
+        """
+        按各桶当前的置位比例估算的误判率
+        """
+        with self._lock:
+            miss = 1.0
+            for bucket in self._buckets:
+                miss *= 1 - (bucket.set_bits / self.m) ** self.k
+            return 1 - miss
+
+    def save(self, path: str):
+        """
+        写入临时文件后替换，写入过程中进程退出不会损坏已有文件
+        """
+        with self._lock:
+            header = {
+                "m": self.m,
+                "k": self.k,
+                "span": self.span,
+                "buckets": [b.epoch for b in self._buckets],
+            }
+            payload = [bytes(b.bits) for b in self._buckets]
+        header_bytes = json.dumps(header).encode("utf-8")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(_MAGIC + struct.pack("<I", len(header_bytes)) + header_bytes)
+            for bits in payload:
+                f.write(bits)
+        os.replace(tmp_path, path)
+
+    def load(self, path: str, now: Optional[float] = None) -> bool:
+        """
+        读取 save 保存的文件，参数不一致或者文件损坏时忽略，返回是否读取成功
+        """
+        try:
+            with open(path, "rb") as f:
+                if f.read(4) != _MAGIC:
+                    return False
+                (length,) = struct.unpack("<I", f.read(4))
+                header = json.loads(f.read(length))
+                if (header["m"], header["k"], header["span"]) != (self.m, self.k, self.span):
+                    return False
+                buckets = []
+                for epoch in header["buckets"]:
+                    bits = bytearray(f.read(self.size_bytes))
+                    if len(bits) != self.size_bytes:
+                        return False
+                    buckets.append(_Bucket(epoch, self.size_bytes, bits))
+        except (OSError, ValueError, KeyError, struct.error):
+            return False
+        with self._lock:
+            self._buckets = buckets
+            self._rotate(time.time() if now is None else now)
+        return True
+
+
+class RecentKeys:
+    """
+    精确的去重集合，记录最近 ttl 秒内的 key，最多保留 max_entries 个，超出时丢弃最早的
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max(1, max_entries)
+        self._expires: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expire(self, now: float):
+        while self._expires:
+            key, expires = next(iter(self._expires.items()))
+            if expires > now:
+                break
+            self._expires.popitem(last=False)
+
+    def contains(self, key: str, now: Optional[float] = None) -> bool:
+        with self._lock:
+            self._expire(time.time() if now is None else now)
+            return key in self._expires
+
+    def add(self, key: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        with self._lock:
+            self._expire(now)
+            self._expires.pop(key, None)
+            self._expires[key] = now + self.ttl
+            while len(self._expires) > self.max_entries:
+                self._expires.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+
+def record_result(scope: str, duplicate: bool, seen: Optional[TimeBucketedBloomFilter] = None):
+    """
+    记录一次去重结果，传入 seen 时同时更新误判率
+    """
+    REGISTRY.inc(
+        DEDUP_TOTAL, _labels(scope=scope, result="duplicate" if duplicate else "unique")
+    )
+    if seen is not None:
+        REGISTRY.set_gauge(
+            DEDUP_FALSE_POSITIVE_RATE, _labels(scope=scope), seen.false_positive_rate()
+        )
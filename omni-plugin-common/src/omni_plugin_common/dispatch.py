@@ -0,0 +1,175 @@
+"""
+按消息类型分发插件
+
+SDK 的 PluginManager 会对每条消息依次 await 所有插件，大部分插件只是检查
+message.local_type 后直接返回。插件通过 get_message_filter() 声明自己关心的
+消息类型和会话范围，DispatchTable 预先按消息类型建好插件列表，
+只调用相关的插件，不再 await 空操作的协程。
+
+没有实现 get_message_filter 的插件视为接收全部消息，保持原有行为。
+分发表只是优化，不根据 enabled 过滤插件，是否处理由插件自己决定，与 SDK 的行为一致。
+"""
+
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+
+SCOPE_ALL = "all"
+SCOPE_PRIVATE = "private"
+SCOPE_ROOM = "room"
+
+
+class MessageFilter:
+    """
+    插件关心的消息
+
+    message_types: 消息类型集合，None 表示全部类型，空集合表示不处理任何消息
+    scope: all / private / room
+    allowed_rooms: 允许处理的群 username，None 表示不限制，仅对群消息生效
+    """
+
+    __slots__ = ("message_types", "scope", "allowed_rooms")
+
+    def __init__(
+        self,
+        message_types: Optional[Iterable[int]] = None,
+        scope: str = SCOPE_ALL,
+        allowed_rooms: Optional[Iterable[str]] = None,
+    ):
+        if scope not in (SCOPE_ALL, SCOPE_PRIVATE, SCOPE_ROOM):
+            raise ValueError(f"未知的会话范围: {scope}")
+        self.message_types = (
+            frozenset(message_types) if message_types is not None else None
+        )
+        self.scope = scope
+        self.allowed_rooms = (
+            frozenset(allowed_rooms) if allowed_rooms is not None else None
+        )
+
+    def matches_type(self, local_type: int) -> bool:
+        return self.message_types is None or local_type in self.message_types
+
+    def matches_scope(self, message) -> bool:
+        is_chatroom = message.is_chatroom
+        if self.scope == SCOPE_ROOM and not is_chatroom:
+            return False
+        if self.scope == SCOPE_PRIVATE and is_chatroom:
+            return False
+        if self.allowed_rooms is not None and is_chatroom:
+            return message.room.username in self.allowed_rooms
+        return True
+
+    def matches(self, message) -> bool:
+        return self.matches_type(message.local_type) and self.matches_scope(message)
+
+    def __repr__(self):
+        return (
+            f"MessageFilter(message_types={self.message_types}, scope={self.scope!r}, "
+            f"allowed_rooms={self.allowed_rooms})"
+        )
+
+
+ALL_MESSAGES = MessageFilter()
+
+
+def get_message_filter(plugin) -> MessageFilter:
+    getter = getattr(plugin, "get_message_filter", None)
+    return getter() if getter else ALL_MESSAGES
+
+
+def table_key(plugins: Iterable) -> Tuple:
+    """
+    插件列表、配置对象或过滤条件变化时分发表需要重建
+    """
+    return tuple(
+        (
+            id(p),
+            id(getattr(p, "plugin_config", None)),
+            id(get_message_filter(p)),
+        )
+        for p in plugins
+    )
+
+
+class DispatchTable:
+    """
+    消息类型 -> 按优先级排序的 (插件, 过滤条件) 列表
+
+    plugins 需要已经按优先级排好序（PluginManager.plugins 即是）
+    """
+
+    def __init__(self, plugins: Iterable):
+        self.plugins = list(plugins)
+        entries = [(p, get_message_filter(p)) for p in self.plugins]
+        # 未声明类型的插件，任意消息类型都要执行
+        self._default: Tuple = tuple(e for e in entries if e[1].message_types is None)
+        types = set()
+        for _, f in entries:
+            if f.message_types:
+                types.update(f.message_types)
+        self._by_type: Dict[int, Tuple] = {
+            t: tuple(e for e in entries if e[1].matches_type(t)) for t in types
+        }
+
+    def candidates(self, local_type: int) -> Tuple:
+        return self._by_type.get(local_type, self._default)
+
+    def plugins_for(self, message) -> List:
+        """
+        返回需要处理这条消息的插件，保持优先级顺序
+        """
+        return [
+            p for p, f in self.candidates(message.local_type) if f.matches_scope(message)
+        ]
+
+
+async def process_message(table: DispatchTable, excute_context, logger=None):
+    """
+    与 SDK PluginManager.process_message 的循环一致，只是跳过了不相关的插件
+    """
+    logger = logger or logging.getLogger(__name__)
+    message = excute_context.get_message()
+    for plugin, message_filter in table.candidates(message.local_type):
+        if not message_filter.matches_scope(message):
+            continue
+        try:
+            await plugin.handle_message(excute_context)
+            if excute_context.should_stop is True:
+                logger.info(f"插件 '{plugin.get_plugin_name()}' 停止了消息链的后续处理。")
+                break
+        except Exception as e:
+            logger.error(
+                f"插件 '{plugin.get_plugin_name()}' 处理消息时出错: {e}", exc_info=True
+            )
+            excute_context.add_error(plugin.get_plugin_name(), str(e))
+    return excute_context.get_responses()
+
+
+def install_dispatch(plugin_manager, context_class=None):
+    """
+    替换 PluginManager 实例的 process_message，改为按分发表调用插件
+
+    插件热重载、配置重载（plugin_config 或过滤条件被替换）后自动重建分发表。
+
+        from omni_plugin_common.dispatch import install_dispatch
+        install_dispatch(bot.plugin_manager)
+    """
+    if context_class is None:
+        from omni_bot_sdk.plugins.interface import PluginExcuteContext
+
+        context_class = PluginExcuteContext
+    state = {"key": None, "table": None}
+
+    def _table() -> DispatchTable:
+        key = table_key(plugin_manager.plugins)
+        if key != state["key"]:
+            state["table"] = DispatchTable(plugin_manager.plugins)
+            state["key"] = key
+        return state["table"]
+
+    async def _process_message(message, context):
+        return await process_message(
+            _table(), context_class(message, context), plugin_manager.logger
+        )
+
+    plugin_manager.process_message = _process_message
+    return plugin_manager
@@ -0,0 +1,237 @@
+"""
+远程服务的连接池和预热
+
+SDK 的 WorkflowClient 每次请求都新建连接，启动后和空闲一段时间后的第一条消息
+还要额外付出 DNS、TCP、TLS 握手的时间。这里提供：
+
+- pooled_client / pooled_async_client: 带 keep-alive 连接池的 httpx 客户端，
+  统计每个请求是新建连接还是复用连接，计数到 omni_plugin_http_connections_total
+- DifyWorkflowClient: 与 SDK WorkflowClient.run 参数和返回值兼容，复用连接池
+- dify_workflow_client: 按插件配置（dify_api_key、dify_base_url 和 PoolConfig 的字段）创建 DifyWorkflowClient
+- start_keep_warm: 启动时在后台线程预先建立连接，空闲超过 probe_interval 后发送探测请求保持连接
+- keep_warm_async: 异步客户端的预热和空闲探测，需要作为后台任务在事件循环中执行
+
+使用本模块的插件需要在依赖中声明 httpx，本模块只在插件启用后才导入。
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import httpx
+
+from .metrics import HTTP_CONNECTIONS, REGISTRY
+
+logger = logging.getLogger(__name__)
+
+
+def _count(pool: str, new_connection: bool):
+    REGISTRY.inc(
+        HTTP_CONNECTIONS, (("pool", pool), ("result", "new" if new_connection else "reused"))
+    )
+
+
+class _CountingTransport(httpx.HTTPTransport):
+    """
+    通过 httpcore 的 trace 事件判断请求是否新建了 TCP 连接
+    """
+
+    def __init__(self, pool: str, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+        self.last_used = time.monotonic()
+
+    def handle_request(self, request):
+        state = {"new": False}
+        previous = request.extensions.get("trace")
+
+        def trace(event_name, info):
+            if event_name == "connection.connect_tcp.started":
+                state["new"] = True
+            if previous:
+                previous(event_name, info)
+
+        request.extensions["trace"] = trace
+        response = super().handle_request(request)
+        self.last_used = time.monotonic()
+        _count(self.pool, state["new"])
+        return response
+
+
+class _AsyncCountingTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, pool: str, **kwargs):
+        super().__init__(**kwargs)
+        self.pool = pool
+        self.last_used = time.monotonic()
+
+    async def handle_async_request(self, request):
+        state = {"new": False}
+        previous = request.extensions.get("trace")
+
+        async def trace(event_name, info):
+            if event_name == "connection.connect_tcp.started":
+                state["new"] = True
+            if previous:
+                await previous(event_name, info)
+
+        request.extensions["trace"] = trace
+        response = await super().handle_async_request(request)
+        self.last_used = time.monotonic()
+        _count(self.pool, state["new"])
+        return response
+
+
+def _limits(max_connections: int, keepalive_expiry: float) -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+
+
+def pooled_client(
+    pool: str,
+    max_connections: int = 10,
+    keepalive_expiry: float = 300,
+    timeout: float = 60,
+) -> httpx.Client:
+    """
+    同步客户端，线程安全，可以在 asyncio.to_thread 中并发使用
+    """
+    return httpx.Client(
+        transport=_CountingTransport(pool, limits=_limits(max_connections, keepalive_expiry)),
+        timeout=timeout,
+    )
+
+
+def pooled_async_client(
+    pool: str,
+    max_connections: int = 10,
+    keepalive_expiry: float = 300,
+    timeout: float = 60,
+) -> httpx.AsyncClient:
+    """
+    异步客户端，连接绑定在第一次使用它的事件循环上
+    """
+    return httpx.AsyncClient(
+        transport=_AsyncCountingTransport(
+            pool, limits=_limits(max_connections, keepalive_expiry)
+        ),
+        timeout=timeout,
+    )
+
+
+def _probe(client: httpx.Client, url: str):
+    try:
+        # 只为建立或保持连接，不关心返回的状态码
+        client.head(url)
+    except httpx.HTTPError as e:
+        logger.debug(f"连接探测失败 {url}: {e}")
+
+
+def warm(client: httpx.Client, url: str, connections: int = 1):
+    """
+    并发发送 connections 个探测请求，让连接池中保持这么多条连接
+    """
+    if connections <= 1:
+        _probe(client, url)
+        return
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        for _ in range(connections):
+            executor.submit(_probe, client, url)
+
+
+async def warm_async(client: httpx.AsyncClient, url: str, connections: int = 1):
+    async def _probe_async():
+        try:
+            await client.head(url)
+        except httpx.HTTPError as e:
+            logger.debug(f"连接探测失败 {url}: {e}")
+
+    await asyncio.gather(*(_probe_async() for _ in range(max(1, connections))))
+
+
+def start_keep_warm(
+    client: httpx.Client,
+    url: str,
+    connections: int = 1,
+    probe_interval: float = 120,
+) -> threading.Event:
+    """
+    在后台线程预热连接，之后空闲超过 probe_interval 秒时再次探测
+    probe_interval 需要小于连接池的 keepalive_expiry，返回的 Event 被 set 后停止
+    """
+    stop_event = threading.Event()
+    transport = client._transport
+
+    def _run():
+        warm(client, url, connections)
+        if probe_interval <= 0:
+            return
+        while not stop_event.wait(probe_interval):
+            idle = time.monotonic() - getattr(transport, "last_used", 0)
+            if idle >= probe_interval:
+                warm(client, url, connections)
+
+    threading.Thread(target=_run, name="http-keep-warm", daemon=True).start()
+    return stop_event
+
+
+async def keep_warm_async(
+    client: httpx.AsyncClient,
+    url: str,
+    connections: int = 1,
+    probe_interval: float = 120,
+):
+    """
+    异步客户端的预热和空闲探测，作为后台任务运行在插件所在的事件循环中
+    """
+    transport = client._transport
+    await warm_async(client, url, connections)
+    if probe_interval <= 0:
+        return
+    while True:
+        await asyncio.sleep(probe_interval)
+        idle = time.monotonic() - getattr(transport, "last_used", 0)
+        if idle >= probe_interval:
+            await warm_async(client, url, connections)
+
+
+class DifyWorkflowClient:
+    """
+    复用连接池的 Dify 工作流客户端，run 的参数和返回值与 SDK 的 WorkflowClient 一致
+    """
+
+    def __init__(self, api_key: str, base_url: str, client: Optional[httpx.Client] = None):
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.client = client or pooled_client("dify")
+
+    def run(self, inputs: dict, response_mode: str = "streaming", user: str = "abc-123"):
+        return self.client.post(
+            f"{self.base_url}/workflows/run",
+            json={"inputs": inputs, "response_mode": response_mode, "user": user},
+            headers={"Authorization": f"Bearer {self.api_key}"},
+        )
+
+    def start_keep_warm(self, connections: int = 1, probe_interval: float = 120):
+        return start_keep_warm(self.client, self.base_url, connections, probe_interval)
+
+
+def dify_workflow_client(name: str, plugin_config) -> DifyWorkflowClient:
+    """
+    按插件配置创建 Dify 客户端，连接池名为 {name}/dify
+    plugin_config 需要有 dify_api_key、dify_base_url 和 PoolConfig 的字段
+    """
+    return DifyWorkflowClient(
+        plugin_config.dify_api_key,
+        plugin_config.dify_base_url,
+        pooled_client(
+            f"{name}/dify",
+            max_connections=plugin_config.max_connections,
+            keepalive_expiry=plugin_config.keepalive_expiry,
+        ),
+    )
@@ -0,0 +1,254 @@
+"""
+大模型调用账本
+
+按 (会话, 模型, 接口) 汇总每次 Dify / OpenAI 调用的 token 数、耗时和错误数。
+记录只在内存中累加，由后台线程定期把一个时间窗口的汇总写入本地 SQLite 或 CSV，
+用于找出消耗 token 最多、尾延迟最高的群和 prompt。
+
+    with LEDGER.call(room, "gpt-4o-mini", "openai-bot-plugin/chat_completion") as entry:
+        response = await client.chat.completions.create(...)
+        entry.set_usage(response.usage.prompt_tokens, response.usage.completion_tokens)
+
+    # metrics-plugin 配置了 ledger_path 时启动定期写入
+    start_ledger_flusher(LEDGER, "llm_usage.sqlite3", interval=60)
+"""
+
+import asyncio
+import csv
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from .metrics import Histogram
+
+LEDGER_COLUMNS = (
+    "window_start",
+    "window_end",
+    "room",
+    "model",
+    "endpoint",
+    "calls",
+    "errors",
+    "prompt_tokens",
+    "completion_tokens",
+    "total_tokens",
+    "latency_sum",
+    "latency_max",
+    "latency_p50",
+    "latency_p99",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS llm_usage (
+    window_start REAL NOT NULL,
+    window_end REAL NOT NULL,
+    room TEXT NOT NULL,
+    model TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    prompt_tokens INTEGER NOT NULL,
+    completion_tokens INTEGER NOT NULL,
+    total_tokens INTEGER NOT NULL,
+    latency_sum REAL NOT NULL,
+    latency_max REAL NOT NULL,
+    latency_p50 REAL NOT NULL,
+    latency_p99 REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_llm_usage_room ON llm_usage (room, window_start);
+"""
+
+Key = Tuple[str, str, str]
+
+
+class _Aggregate:
+    __slots__ = (
+        "calls",
+        "errors",
+        "prompt_tokens",
+        "completion_tokens",
+        "total_tokens",
+        "latency",
+        "latency_max",
+    )
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+        self.latency = Histogram()
+        self.latency_max = 0.0
+
+
+class LedgerEntry:
+    """
+    一次调用的记录，在 LEDGER.call 的 with 块中填写 token 数
+    """
+
+    __slots__ = ("prompt_tokens", "completion_tokens", "total_tokens")
+
+    def __init__(self):
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.total_tokens = 0
+
+    def set_usage(
+        self,
+        prompt_tokens: Optional[int] = 0,
+        completion_tokens: Optional[int] = 0,
+        total_tokens: Optional[int] = None,
+    ):
+        self.prompt_tokens = prompt_tokens or 0
+        self.completion_tokens = completion_tokens or 0
+        self.total_tokens = (
+            total_tokens
+            if total_tokens is not None
+            else self.prompt_tokens + self.completion_tokens
+        ) or 0
+
+
+class UsageLedger:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._aggregates: Dict[Key, _Aggregate] = {}
+        self._window_start = time.time()
+
+    def record(
+        self,
+        room: str,
+        model: str,
+        endpoint: str,
+        seconds: float,
+        prompt_tokens: int = 0,
+        completion_tokens: int = 0,
+        total_tokens: Optional[int] = None,
+        error: bool = False,
+    ):
+        if total_tokens is None:
+            total_tokens = prompt_tokens + completion_tokens
+        key = (room or "", model or "", endpoint)
+        with self._lock:
+            aggregate = self._aggregates.get(key)
+            if aggregate is None:
+                aggregate = self._aggregates[key] = _Aggregate()
+            aggregate.calls += 1
+            aggregate.errors += int(error)
+            aggregate.prompt_tokens += prompt_tokens
+            aggregate.completion_tokens += completion_tokens
+            aggregate.total_tokens += total_tokens
+            aggregate.latency.observe(seconds)
+            aggregate.latency_max = max(aggregate.latency_max, seconds)
+
+    @contextmanager
+    def call(self, room: str, model: str, endpoint: str):
+        """
+        记录一次调用的耗时，异常计为错误后继续抛出，被取消的调用不计为错误
+        """
+        entry = LedgerEntry()
+        start = time.perf_counter()
+        error = False
+        try:
+            yield entry
+        except asyncio.CancelledError:
+            raise
+        except BaseException:
+            error = True
+            raise
+        finally:
+            self.record(
+                room,
+                model,
+                endpoint,
+                time.perf_counter() - start,
+                entry.prompt_tokens,
+                entry.completion_tokens,
+                entry.total_tokens,
+                error,
+            )
+
+    def drain(self) -> List[tuple]:
+        """
+        取出当前窗口的汇总并开始新的窗口，返回按 LEDGER_COLUMNS 排列的行
+        """
+        now = time.time()
+        with self._lock:
+            aggregates, self._aggregates = self._aggregates, {}
+            window_start, self._window_start = self._window_start, now
+        return [
+            (
+                window_start,
+                now,
+                room,
+                model,
+                endpoint,
+                a.calls,
+                a.errors,
+                a.prompt_tokens,
+                a.completion_tokens,
+                a.total_tokens,
+                a.latency.sum,
+                a.latency_max,
+                a.latency.quantile(0.5),
+                a.latency.quantile(0.99),
+            )
+            for (room, model, endpoint), a in aggregates.items()
+        ]
+
+
+def write_rows(path: str, rows: List[tuple]):
+    """
+    .csv 结尾时追加到 CSV 文件，否则写入 SQLite 的 llm_usage 表
+    """
+    if not rows:
+        return
+    if path.endswith(".csv"):
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(LEDGER_COLUMNS)
+            writer.writerows(rows)
+        return
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(_SCHEMA)
+        with conn:
+            conn.executemany(
+                f"INSERT INTO llm_usage ({', '.join(LEDGER_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(LEDGER_COLUMNS))})",
+                rows,
+            )
+    finally:
+        conn.close()
+
+
+def start_ledger_flusher(
+    ledger: "UsageLedger", path: str, interval: float, logger=None
+) -> threading.Event:
+    """
+    在后台线程定期写入账本，返回的 Event 被 set 后写入最后一个窗口并停止
+    """
+    stop_event = threading.Event()
+
+    def _flush():
+        try:
+            write_rows(path, ledger.drain())
+        except Exception as e:
+            if logger:
+                logger.error(f"写入调用账本失败: {e}")
+
+    def _run():
+        while not stop_event.wait(interval):
+            _flush()
+        _flush()
+
+    threading.Thread(target=_run, name="llm-ledger", daemon=True).start()
+    return stop_event
+
+
+LEDGER = UsageLedger()
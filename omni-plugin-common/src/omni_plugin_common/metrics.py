@@ -0,0 +1,361 @@
+"""
+插件指标统计
+
+- 每个插件 handle_message 的耗时直方图，以及 handled / skipped / failed 计数
+- 每个外部调用（Dify、OpenAI、数据库、下载等）的耗时直方图和错误计数
+- 支持导出为 Prometheus 文本格式，或者定期输出到日志
+
+所有插件共享同一个 REGISTRY，记录只是加锁后的几次整数/浮点运算，开销很低。
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+# 秒，覆盖从本地处理到远程大模型调用的范围
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+PLUGIN_SECONDS = "omni_plugin_handle_seconds"
+PLUGIN_MESSAGES = "omni_plugin_messages_total"
+CALL_SECONDS = "omni_plugin_external_call_seconds"
+CALL_ERRORS = "omni_plugin_external_call_errors_total"
+HTTP_CONNECTIONS = "omni_plugin_http_connections_total"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """
+    固定桶的直方图，分位数按桶内线性插值估算
+    """
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # 最后一个桶是 +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            if seen + c >= rank and c > 0:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                upper = self.buckets[i]
+                return lower + (upper - lower) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+    def copy(self) -> "Histogram":
+        h = Histogram(self.buckets)
+        h.counts = list(self.counts)
+        h.sum = self.sum
+        h.count = self.count
+        return h
+
+
+def _labels(**labels) -> Labels:
+    return tuple(sorted(labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in items) + "}"
+
+
+class MetricsRegistry:
+    """
+    线程安全的指标注册表
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._gauges: Dict[Tuple[str, Labels], float] = {}
+
+    def inc(self, name: str, labels: Labels = (), value: float = 1):
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, labels: Labels, value: float):
+        with self._lock:
+            self._gauges[(name, labels)] = value
+
+    def gauges(self) -> Dict[Tuple[str, Labels], float]:
+        with self._lock:
+            return dict(self._gauges)
+
+    def observe(self, name: str, labels: Labels, value: float):
+        key = (name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def snapshot(self):
+        """
+        返回 (counters, histograms) 的拷贝，导出时不长时间持有锁
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {k: h.copy() for k, h in self._histograms.items()}
+        return counters, histograms
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._gauges.clear()
+
+    def render_prometheus(self) -> str:
+        """
+        导出为 Prometheus 文本格式
+        """
+        counters, histograms = self.snapshot()
+        gauges = self.gauges()
+        lines = []
+        for name in sorted({k[0] for k in gauges}):
+            lines.append(f"# TYPE {name} gauge")
+            for (n, labels), value in sorted(gauges.items()):
+                if n == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for name in sorted({k[0] for k in counters}):
+            lines.append(f"# TYPE {name} counter")
+            for (n, labels), value in sorted(counters.items()):
+                if n == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+        for name in sorted({k[0] for k in histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for (n, labels), h in sorted(histograms.items(), key=lambda i: i[0]):
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, c in zip(h.buckets, h.counts):
+                    cumulative += c
+                    lines.append(
+                        f"{name}_bucket{_format_labels(labels, ('le', f'{bound:g}'))} {cumulative}"
+                    )
+                lines.append(
+                    f"{name}_bucket{_format_labels(labels, ('le', '+Inf'))} {h.count}"
+                )
+                lines.append(f"{name}_sum{_format_labels(labels)} {h.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def format_summary(self) -> str:
+        """
+        生成便于阅读的日志摘要，每个插件/外部调用一行
+        """
+        counters, histograms = self.snapshot()
+        outcomes: Dict[str, Dict[str, int]] = {}
+        connections: Dict[str, Dict[str, int]] = {}
+        for (name, labels), value in counters.items():
+            if name == PLUGIN_MESSAGES:
+                d = dict(labels)
+                outcomes.setdefault(d["plugin"], {})[d["outcome"]] = int(value)
+            elif name == HTTP_CONNECTIONS:
+                d = dict(labels)
+                connections.setdefault(d["pool"], {})[d["result"]] = int(value)
+        lines = []
+        for (name, labels), h in sorted(histograms.items(), key=lambda i: i[0]):
+            d = dict(labels)
+            if name == PLUGIN_SECONDS:
+                o = outcomes.get(d["plugin"], {})
+                lines.append(
+                    f"[{d['plugin']}] n={h.count} p50={h.quantile(0.5) * 1000:.1f}ms "
+                    f"p99={h.quantile(0.99) * 1000:.1f}ms handled={o.get('handled', 0)} "
+                    f"skipped={o.get('skipped', 0)} failed={o.get('failed', 0)}"
+                )
+            elif name == CALL_SECONDS:
+                errors = int(counters.get((CALL_ERRORS, labels), 0))
+                lines.append(
+                    f"[{d['plugin']}/{d['call']}] n={h.count} p50={h.quantile(0.5) * 1000:.1f}ms "
+                    f"p99={h.quantile(0.99) * 1000:.1f}ms errors={errors}"
+                )
+        for pool, c in sorted(connections.items()):
+            new, reused = c.get("new", 0), c.get("reused", 0)
+            lines.append(
+                f"[pool:{pool}] requests={new + reused} new={new} reused={reused} "
+                f"reuse={reused / ((new + reused) or 1):.1%}"
+            )
+        return "\n".join(lines)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def _is_stopped(context) -> bool:
+    # SDK 中 should_stop 同时是方法名和实例属性，这里只认布尔值
+    return getattr(context, "should_stop", False) is True
+
+
+# 正在执行的 handle_message：[插件名, 是否已标记失败]
+_CURRENT_OUTCOME: "contextvars.ContextVar[Optional[list]]" = contextvars.ContextVar(
+    "omni_plugin_current_outcome", default=None
+)
+
+
+def mark_failed(plugin: str):
+    """
+    插件在内部捕获了异常、没有抛出时调用，把这条消息记为 failed
+
+    在该插件的 handle_message 中调用时，本次处理记为 failed 而不是 handled / skipped；
+    在其他地方调用（例如被其他插件读取时才执行的惰性生产者）时直接计入 failed
+    """
+    current = _CURRENT_OUTCOME.get()
+    if current is not None and current[0] == plugin:
+        current[1] = True
+    else:
+        REGISTRY.inc(PLUGIN_MESSAGES, _labels(plugin=plugin, outcome="failed"))
+
+
+def instrument_plugin(handle_message):
+    """
+    handle_message 装饰器，记录耗时和处理结果
+
+    - failed: 抛出异常，或者调用了 mark_failed
+    - handled: 添加了响应或中断了消息链
+    - skipped: 其他情况
+    """
+
+    @functools.wraps(handle_message)
+    async def wrapper(self, context, *args, **kwargs):
+        plugin = self.get_plugin_name()
+        responses_before = len(context.get_responses())
+        stopped_before = _is_stopped(context)
+        current = [plugin, False]
+        token = _CURRENT_OUTCOME.set(current)
+        start = time.perf_counter()
+        try:
+            result = await handle_message(self, context, *args, **kwargs)
+        except Exception:
+            REGISTRY.inc(PLUGIN_MESSAGES, _labels(plugin=plugin, outcome="failed"))
+            raise
+        finally:
+            REGISTRY.observe(
+                PLUGIN_SECONDS, _labels(plugin=plugin), time.perf_counter() - start
+            )
+            _CURRENT_OUTCOME.reset(token)
+        if current[1]:
+            outcome = "failed"
+        elif len(context.get_responses()) != responses_before or (
+            _is_stopped(context) and not stopped_before
+        ):
+            outcome = "handled"
+        else:
+            outcome = "skipped"
+        REGISTRY.inc(PLUGIN_MESSAGES, _labels(plugin=plugin, outcome=outcome))
+        return result
+
+    return wrapper
+
+
+@contextmanager
+def track_call(plugin: str, call: str):
+    """
+    记录一次外部调用的耗时，异常会计入错误数后继续抛出，被取消的调用不计入错误
+
+    with track_call(self.name, "dify_workflow"):
+        response = self.dify_client.run(...)
+    """
+    labels = _labels(plugin=plugin, call=call)
+    start = time.perf_counter()
+    try:
+        yield
+    except asyncio.CancelledError:
+        raise
+    except BaseException:
+        REGISTRY.inc(CALL_ERRORS, labels)
+        raise
+    finally:
+        REGISTRY.observe(CALL_SECONDS, labels, time.perf_counter() - start)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self):
+        body = self.registry.render_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_prometheus_server(
+    port: int, host: str = "127.0.0.1", registry: MetricsRegistry = REGISTRY
+) -> ThreadingHTTPServer:
+    """
+    在后台线程启动一个只返回指标文本的 HTTP 服务
+    """
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(
+        target=server.serve_forever, name="metrics-http", daemon=True
+    ).start()
+    return server
+
+
+def start_summary_logger(
+    logger: logging.Logger, interval: float, registry: MetricsRegistry = REGISTRY
+) -> threading.Event:
+    """
+    在后台线程定期输出指标摘要，返回的 Event 被 set 后停止
+    """
+    stop_event = threading.Event()
+
+    def _run():
+        while not stop_event.wait(interval):
+            summary = registry.format_summary()
+            if summary:
+                logger.info(f"插件指标摘要:\n{summary}")
+
+    threading.Thread(target=_run, name="metrics-summary", daemon=True).start()
+    return stop_event
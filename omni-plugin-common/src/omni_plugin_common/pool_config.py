@@ -0,0 +1,45 @@
+"""
+插件共用的连接池配置
+
+插件配置类继承 PoolConfig 即可获得连接池和预热相关的字段：
+
+    class BotCheckPluginConfig(PoolConfig):
+        enabled: bool = False
+        dify_base_url: str = ""
+
+本模块不导入 httpx，插件导入配置类时不会拖慢启动，http_pool 只在真正创建客户端时才导入。
+"""
+
+import threading
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class PoolConfig(BaseModel):
+    """
+    连接池配置
+    max_connections: 连接池的最大连接数
+    keepalive_expiry: 空闲连接保持的秒数
+    warm_connections: 预先建立的连接数，0 表示不预热（默认）。开启后会在后台向服务地址发送 HEAD 探测请求
+    probe_interval: 连接空闲多少秒后发送探测请求保持连接，0 表示不探测，需要小于 keepalive_expiry，只在预热开启时生效
+    """
+
+    max_connections: int = 10
+    keepalive_expiry: float = 300
+    warm_connections: int = 0
+    probe_interval: float = 120
+
+
+def start_dify_keep_warm(plugin) -> Optional[threading.Event]:
+    """
+    插件已启用、配置了 dify_base_url 且 warm_connections 大于 0 时，在后台预热 plugin.dify_client
+    返回的 Event 被 set 后停止，不预热时返回 None，也不会创建客户端
+    """
+    config = plugin.plugin_config
+    if not (plugin.enabled and config.dify_base_url and config.warm_connections > 0):
+        return None
+    # 启动时预先建立到 Dify 的连接，第一条消息不用再等握手
+    return plugin.dify_client.start_keep_warm(
+        config.warm_connections, config.probe_interval
+    )
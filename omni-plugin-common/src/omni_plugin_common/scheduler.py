@@ -0,0 +1,179 @@
+"""
+按会话并发执行插件链
+
+不同群、不同联系人的消息并发处理，同一个会话内严格按到达顺序串行处理，
+保证 chat_history 和 should_stop 的语义不变。
+
+- 会话 key 与 ChatContextPlugin 一致：群聊用 room.username，私聊用 contact.username
+- workers 限制同时处理的会话数
+- max_queue_per_conversation 限制单个会话的积压，超出后按 overflow 策略丢弃
+
+    from omni_plugin_common.scheduler import install_scheduler
+    install_scheduler(bot.plugin_manager, workers=4, max_queue_per_conversation=50)
+"""
+
+import asyncio
+import logging
+import weakref
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from .metrics import REGISTRY
+
+OVERFLOW_DROP_OLDEST = "drop_oldest"
+OVERFLOW_REJECT = "reject"
+
+SCHEDULER_DROPPED = "omni_plugin_scheduler_dropped_total"
+
+# 当前进程中所有的调度器，用于统计总积压
+_SCHEDULERS: "weakref.WeakSet[ConversationScheduler]" = weakref.WeakSet()
+
+
+def conversation_key(message) -> str:
+    """
+    消息所属会话，群聊为群 username，私聊为联系人 username
+    """
+    return message.room.username if message.is_chatroom else message.contact.username
+
+
+class ConversationScheduler:
+    def __init__(
+        self,
+        process: Callable[..., Awaitable[List]],
+        workers: int = 4,
+        max_queue_per_conversation: int = 50,
+        overflow: str = OVERFLOW_DROP_OLDEST,
+        logger: Optional[logging.Logger] = None,
+    ):
+        if overflow not in (OVERFLOW_DROP_OLDEST, OVERFLOW_REJECT):
+            raise ValueError(f"未知的溢出策略: {overflow}")
+        self.process = process
+        self.workers = max(1, workers)
+        self.max_queue_per_conversation = max(1, max_queue_per_conversation)
+        self.overflow = overflow
+        self.logger = logger or logging.getLogger(__name__)
+        self._queues: Dict[str, Deque[Tuple]] = {}
+        # 正在处理或者已经在 _ready 中排队的会话
+        self._scheduled: Set[str] = set()
+        self._ready: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        # 所有会话队列中的消息总数，降载时每条消息都会读取，不逐个队列求和
+        self._pending_total = 0
+        _SCHEDULERS.add(self)
+
+    def _ensure_workers(self):
+        if self._tasks:
+            return
+        self._ready = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"conversation-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    def pending(self, key: Optional[str] = None) -> int:
+        if key is not None:
+            return len(self._queues.get(key, ()))
+        return self._pending_total
+
+    def submit(self, message, context: dict) -> asyncio.Future:
+        """
+        放入会话队列，返回的 future 在插件链处理完成后得到 responses，被丢弃或者处理被取消时得到 []
+        """
+        self._ensure_workers()
+        key = conversation_key(message)
+        future = asyncio.get_running_loop().create_future()
+        queue = self._queues.setdefault(key, deque())
+        if len(queue) >= self.max_queue_per_conversation:
+            if self.overflow == OVERFLOW_REJECT:
+                REGISTRY.inc(SCHEDULER_DROPPED, (("reason", "reject"),))
+                self.logger.warning(f"会话 {key} 积压过多，丢弃新消息")
+                future.set_result([])
+                return future
+            _, _, dropped = queue.popleft()
+            self._pending_total -= 1
+            REGISTRY.inc(SCHEDULER_DROPPED, (("reason", "drop_oldest"),))
+            self.logger.warning(f"会话 {key} 积压过多，丢弃最早的消息")
+            if not dropped.done():
+                dropped.set_result([])
+        queue.append((message, context, future))
+        self._pending_total += 1
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+        return future
+
+    async def _worker(self):
+        while True:
+            key = await self._ready.get()
+            queue = self._queues.get(key)
+            if queue:
+                message, context, future = queue.popleft()
+                self._pending_total -= 1
+                try:
+                    result = await self.process(message, context)
+                    if not future.done():
+                        future.set_result(result)
+                except asyncio.CancelledError:
+                    if _worker_cancelled():
+                        if not future.done():
+                            future.cancel()
+                        raise
+                    # 插件内部等待了被取消的任务，只影响这一条消息，worker 继续处理
+                    self.logger.warning(f"会话 {key} 处理消息时被取消")
+                    if not future.done():
+                        future.set_result([])
+                except Exception as e:
+                    self.logger.error(f"会话 {key} 处理消息时出错: {e}", exc_info=True)
+                    if not future.done():
+                        future.set_exception(e)
+            if queue:
+                # 同一会话还有消息，排到队尾，让其他会话也有机会执行
+                self._ready.put_nowait(key)
+            else:
+                self._queues.pop(key, None)
+                self._scheduled.discard(key)
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+
+def _worker_cancelled() -> bool:
+    """
+    当前 task 自身是否正在被取消，Python 3.11 之前无法区分，一律按被取消处理
+    """
+    cancelling = getattr(asyncio.current_task(), "cancelling", None)
+    return cancelling is None or cancelling() > 0
+
+
+def total_pending() -> int:
+    """
+    所有调度器中等待处理的消息数
+    """
+    return sum(s.pending() for s in list(_SCHEDULERS))
+
+
+def install_scheduler(
+    plugin_manager,
+    workers: int = 4,
+    max_queue_per_conversation: int = 50,
+    overflow: str = OVERFLOW_DROP_OLDEST,
+) -> ConversationScheduler:
+    """
+    用会话调度包装 PluginManager 实例的 process_message，可以与 install_dispatch 叠加
+    """
+    scheduler = ConversationScheduler(
+        plugin_manager.process_message,
+        workers=workers,
+        max_queue_per_conversation=max_queue_per_conversation,
+        overflow=overflow,
+        logger=plugin_manager.logger,
+    )
+
+    async def _process_message(message, context):
+        return await scheduler.submit(message, context)
+
+    plugin_manager.process_message = _process_message
+    return scheduler
@@ -0,0 +1,110 @@
+"""
+插件启动耗时分析
+
+分别统计每个插件模块的导入耗时和插件实例化（__init__）耗时，结果同时记录到 metrics：
+
+    python -m omni_plugin_common.startup
+    python -m omni_plugin_common.startup --isolated   # 每个插件在独立进程中导入，互不分摊公共依赖
+
+同一进程中依次导入时，公共依赖（pydantic、SDK 等）的耗时算在第一个导入它的插件上。
+插件实例化需要 Bot，离线分析见 benchmarks/startup_profile.py。
+"""
+
+import argparse
+import importlib
+import json
+import subprocess
+import sys
+import time
+from importlib.metadata import entry_points
+from typing import Callable, Dict, List, Optional
+
+from .metrics import REGISTRY
+
+ENTRY_POINT_GROUP = "omni_bot.plugins"
+STARTUP_SECONDS = "omni_plugin_startup_seconds"
+
+
+def entry_point_targets(group: str = ENTRY_POINT_GROUP) -> Dict[str, str]:
+    """
+    已安装插件的 插件id -> "模块:类"
+    """
+    return {ep.name: ep.value for ep in entry_points(group=group)}
+
+
+def _record(plugin_id: str, phase: str, seconds: float):
+    REGISTRY.observe(STARTUP_SECONDS, (("plugin", plugin_id), ("phase", phase)), seconds)
+
+
+def profile_plugin(
+    plugin_id: str, target: str, bot_factory: Optional[Callable[[], object]] = None
+) -> dict:
+    """
+    导入一个插件并计时，传入 bot_factory 时再计时实例化
+    """
+    module_name, class_name = target.split(":")
+    row = {"plugin": plugin_id, "import": None, "init": None, "error": None}
+    try:
+        start = time.perf_counter()
+        plugin_class = getattr(importlib.import_module(module_name), class_name)
+        row["import"] = time.perf_counter() - start
+        _record(plugin_id, "import", row["import"])
+        if bot_factory is not None:
+            bot = bot_factory()
+            start = time.perf_counter()
+            plugin_class(bot)
+            row["init"] = time.perf_counter() - start
+            _record(plugin_id, "init", row["init"])
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    return row
+
+
+def profile_isolated(plugin_id: str, argv: List[str]) -> dict:
+    """
+    在子进程中执行 argv，读取最后一行输出的 JSON 结果
+    """
+    result = subprocess.run(argv, capture_output=True, text=True)
+    lines = result.stdout.strip().splitlines()
+    if result.returncode != 0 or not lines:
+        error = (result.stderr.strip().splitlines() or ["子进程异常退出"])[-1]
+        return {"plugin": plugin_id, "import": None, "init": None, "error": error}
+    return json.loads(lines[-1])
+
+
+def format_profile(rows: List[dict]) -> str:
+    def ms(value):
+        return f"{value * 1000:.1f}" if value is not None else "-"
+
+    lines = [f"{'plugin':<28}{'import(ms)':>12}{'init(ms)':>12}  error"]
+    for row in sorted(rows, key=lambda r: -((r["import"] or 0) + (r["init"] or 0))):
+        lines.append(
+            f"{row['plugin']:<28}{ms(row['import']):>12}{ms(row['init']):>12}  {row['error'] or ''}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="统计插件导入耗时")
+    parser.add_argument("--group", default=ENTRY_POINT_GROUP, help="插件入口点分组")
+    parser.add_argument("--isolated", action="store_true", help="每个插件在独立进程中导入")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    targets = entry_point_targets(args.group)
+    if args.child:
+        print(json.dumps(profile_plugin(args.child, targets[args.child])))
+        return
+    rows = []
+    for plugin_id, target in sorted(targets.items()):
+        if args.isolated:
+            child = [sys.executable, "-m", "omni_plugin_common.startup"]
+            child += ["--group", args.group, "--child", plugin_id]
+            rows.append(profile_isolated(plugin_id, child))
+        else:
+            rows.append(profile_plugin(plugin_id, target))
+    print(format_profile(rows))
+
+
+if __name__ == "__main__":
+    main()
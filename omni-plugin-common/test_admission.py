@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试过期消息丢弃和积压降载
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from omni_plugin_common.admission import (  # noqa: E402
+    REASON_BACKLOG,
+    REASON_STALE,
+    SHED_TOTAL,
+    AdmissionPolicy,
+)
+from omni_plugin_common.metrics import REGISTRY  # noqa: E402
+from omni_plugin_common.scheduler import ConversationScheduler, total_pending  # noqa: E402
+
+
+def message(create_time, room="r"):
+    return SimpleNamespace(
+        create_time=create_time,
+        is_chatroom=True,
+        room=SimpleNamespace(username=room),
+        contact=None,
+    )
+
+
+def test_stale_messages():
+    REGISTRY.reset()
+    policy = AdmissionPolicy(max_age=60)
+    assert policy.admit("p", message(1000), now=1030)
+    assert not policy.admit("p", message(1000), now=1061)
+    # 没有 create_time 的消息视为刚收到
+    assert policy.admit("p", message(0), now=1061)
+    assert AdmissionPolicy().admit("p", message(1), now=10**9)
+    counters, _ = REGISTRY.snapshot()
+    assert counters[(SHED_TOTAL, (("plugin", "p"), ("reason", REASON_STALE)))] == 1
+
+
+def test_backlog_shedding():
+    REGISTRY.reset()
+    policy = AdmissionPolicy(max_backlog=3)
+    seen = []
+
+    async def run():
+        release = asyncio.Event()
+
+        async def process(msg, context):
+            await release.wait()
+            seen.append(policy.reason(msg))
+            return []
+
+        scheduler = ConversationScheduler(process, workers=1)
+        futures = [scheduler.submit(message(0), {}) for _ in range(5)]
+        await asyncio.sleep(0)
+        # 一条正在处理，四条在队列中
+        pending = total_pending()
+        release.set()
+        await asyncio.gather(*futures)
+        await scheduler.close()
+        return pending
+
+    assert asyncio.run(run()) == 4
+    assert seen == [REASON_BACKLOG, REASON_BACKLOG, None, None, None]
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试上下文 key 的惰性生产
+"""
+
+import asyncio
+import gc
+import os
+import sys
+import weakref
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from omni_plugin_common.context_keys import ContextKey, register_key  # noqa: E402
+
+
+class FakeExcuteContext:
+    def __init__(self):
+        self.context = {}
+
+    def get_context(self):
+        return self.context
+
+
+def test_sync_producer_runs_once():
+    key = ContextKey("lazy_sync", str, "")
+    calls = []
+    excute_context = FakeExcuteContext()
+    assert key.get(excute_context) == ""
+    key.provide(excute_context, lambda: calls.append(1) or "value")
+    assert "lazy_sync" not in excute_context.context
+    assert key.is_available(excute_context)
+    assert key.get(excute_context) == "value"
+    assert key.get(excute_context) == "value"
+    assert excute_context.context["lazy_sync"] == "value"
+    # 已经计算出的值也可以直接从 dict 读取
+    assert key.get(excute_context.context) == "value"
+    assert calls == [1]
+
+
+def test_async_producer_shared():
+    key = ContextKey("lazy_async", bool, False)
+    calls = []
+
+    async def produce():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return True
+
+    async def run():
+        excute_context = FakeExcuteContext()
+        key.provide(excute_context, produce)
+        results = await asyncio.gather(key.aget(excute_context), key.aget(excute_context))
+        return results, excute_context.context
+
+    results, context = asyncio.run(run())
+    assert results == [True, True]
+    assert context["lazy_async"] is True
+    assert calls == [1]
+
+
+def test_register_key_type_conflict():
+    register_key("test_key", int)
+    assert register_key("test_key", int).type is int
+    try:
+        register_key("test_key", str)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("重复声明不同类型时应抛出 ValueError")
+
+
+def test_producers_kept_outside_context():
+    key = ContextKey("lazy_hidden", str, "")
+
+    class Producer:
+        def __call__(self):
+            return "value"
+
+    producer = Producer()
+    producer_ref = weakref.ref(producer)
+    excute_context = FakeExcuteContext()
+    context = excute_context.context
+    key.provide(excute_context, producer)
+    del producer
+    # dict 中只有已经计算出的值
+    assert context == {}
+    assert key.is_pending(excute_context)
+    assert not key.is_pending(context)
+    assert key.get(context) == ""
+    # 生产者随 PluginExcuteContext 一起释放
+    del excute_context
+    gc.collect()
+    assert producer_ref() is None
+    try:
+        key.provide(context, lambda: "value")
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("向 dict 登记惰性生产者时应抛出 TypeError")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试重复消息过滤
+"""
+
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from omni_plugin_common.dedup import (  # noqa: E402
+    DEDUP_FALSE_POSITIVE_RATE,
+    RecentKeys,
+    TimeBucketedBloomFilter,
+    message_identity,
+    record_result,
+)
+from omni_plugin_common.metrics import REGISTRY  # noqa: E402
+
+
+def test_check_and_add_expires_after_window():
+    seen = TimeBucketedBloomFilter(capacity=1000, window_seconds=60, buckets=6)
+    assert not seen.check_and_add("a", now=0)
+    assert seen.check_and_add("a", now=30)
+    # 最后一个包含 "a" 的桶是 [0, 10)，到 60 秒时移出窗口
+    assert seen.check_and_add("a", now=59)
+    assert not seen.check_and_add("a", now=60)
+
+    # 断线恢复时的突发消息集中在同一个桶里，查询的 key 也会写入，合计不超过容量
+    for i in range(500):
+        seen.check_and_add(f"key-{i}", now=61)
+    false_positives = sum(seen.check_and_add(f"other-{i}", now=61) for i in range(500))
+    assert false_positives < 5
+    assert 0 < seen.false_positive_rate() < 0.01
+
+
+def test_recent_keys():
+    keys = RecentKeys(ttl=60, max_entries=2)
+    keys.add("a", now=0)
+    assert keys.contains("a", now=59)
+    assert not keys.contains("a", now=60)
+    keys.add("a", now=100)
+    keys.add("b", now=101)
+    keys.add("c", now=102)
+    # 超出 max_entries 时丢弃最早的
+    assert not keys.contains("a", now=103)
+    assert keys.contains("b", now=103) and keys.contains("c", now=103)
+    assert len(keys) == 2
+
+
+def test_save_and_load():
+    seen = TimeBucketedBloomFilter(capacity=1000, window_seconds=60)
+    seen.check_and_add("a", now=100)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dedup.bin")
+        seen.save(path)
+        restored = TimeBucketedBloomFilter(capacity=1000, window_seconds=60)
+        assert restored.load(path, now=110)
+        assert restored.check_and_add("a", now=110)
+        # 参数不同的过滤器不读取
+        assert not TimeBucketedBloomFilter(capacity=5000, window_seconds=60).load(path)
+
+
+def test_message_identity_and_metrics():
+    room = SimpleNamespace(username="room@chatroom")
+    message = SimpleNamespace(
+        server_id=0,
+        local_type=1,
+        create_time=100,
+        content="hello",
+        is_chatroom=True,
+        room=room,
+        contact=None,
+    )
+    identity = message_identity(message)
+    assert identity.startswith("c:") and identity == message_identity(message)
+    assert message_identity(SimpleNamespace(server_id=42)) == "s:42"
+
+    REGISTRY.reset()
+    seen = TimeBucketedBloomFilter(capacity=1000)
+    record_result("message", seen.check_and_add(identity), seen)
+    record_result("message", seen.check_and_add(identity), seen)
+    text = REGISTRY.render_prometheus()
+    assert 'omni_plugin_dedup_total{result="duplicate",scope="message"} 1' in text
+    assert 'omni_plugin_dedup_total{result="unique",scope="message"} 1' in text
+    assert f'{DEDUP_FALSE_POSITIVE_RATE}{{scope="message"}}' in text
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试按消息类型分发插件
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from omni_plugin_common.dispatch import (  # noqa: E402
+    SCOPE_PRIVATE,
+    SCOPE_ROOM,
+    DispatchTable,
+    MessageFilter,
+    install_dispatch,
+)
+
+TEXT, PAT, SYSTEM, IMAGE = 1, 2, 3, 4
+
+
+class FakePlugin:
+    def __init__(self, name, message_filter=None, stop=False, error=None, enabled=True):
+        self.name = name
+        self.stop = stop
+        self.error = error
+        self.plugin_config = SimpleNamespace(enabled=enabled)
+        if message_filter is not None:
+            self.get_message_filter = lambda: message_filter
+
+    def get_plugin_name(self):
+        return self.name
+
+    async def handle_message(self, context):
+        context.called.append(self.name)
+        if self.error:
+            raise self.error
+        if self.stop:
+            context.should_stop = True
+
+
+class FakeContext:
+    def __init__(self, message, context):
+        self.message = message
+        self.context = context
+        self.should_stop = False
+        self.called = context.setdefault("called", [])
+        self.errors = context.setdefault("errors", [])
+
+    def get_message(self):
+        return self.message
+
+    def get_context(self):
+        return self.context
+
+    def add_error(self, plugin_name, error_message):
+        self.errors.append((plugin_name, error_message))
+
+    def get_responses(self):
+        return []
+
+
+def message(local_type, room=None):
+    return SimpleNamespace(
+        local_type=local_type,
+        is_chatroom=room is not None,
+        room=SimpleNamespace(username=room) if room else None,
+    )
+
+
+def names(plugins):
+    return [p.name for p in plugins]
+
+
+def test_dispatch_table():
+    plugins = [
+        FakePlugin("bot-check", MessageFilter([TEXT], scope=SCOPE_ROOM)),
+        FakePlugin("legacy"),
+        FakePlugin("private-only", MessageFilter([TEXT], scope=SCOPE_PRIVATE)),
+        FakePlugin("pat", MessageFilter([PAT])),
+        FakePlugin("welcome", MessageFilter([SYSTEM], SCOPE_ROOM, ["r1"])),
+        FakePlugin("metrics", MessageFilter(())),
+    ]
+    table = DispatchTable(plugins)
+    assert names(table.plugins_for(message(TEXT, "r1"))) == ["bot-check", "legacy"]
+    assert names(table.plugins_for(message(TEXT))) == ["legacy", "private-only"]
+    assert names(table.plugins_for(message(PAT))) == ["legacy", "pat"]
+    assert names(table.plugins_for(message(SYSTEM, "r1"))) == ["legacy", "welcome"]
+    assert names(table.plugins_for(message(SYSTEM, "r2"))) == ["legacy"]
+    assert names(table.plugins_for(message(IMAGE))) == ["legacy"]
+
+
+def test_install_dispatch():
+    broken = FakePlugin("broken", MessageFilter([TEXT]), error=RuntimeError("boom"))
+    stopper = FakePlugin("stopper", MessageFilter([TEXT]), stop=True)
+    disabled = FakePlugin("disabled", enabled=False)
+    after = FakePlugin("after")
+    manager = SimpleNamespace(
+        plugins=[broken, disabled, stopper, after], logger=logging.getLogger("test")
+    )
+    install_dispatch(manager, FakeContext)
+
+    def run(msg):
+        context = {}
+        asyncio.run(manager.process_message(msg, context))
+        return context
+
+    # 出错的插件记录错误后继续，停止消息链后不再调用后续插件
+    # 分发表不根据 enabled 过滤，未启用的插件与 SDK 一样照常调用，由插件自己判断
+    context = run(message(TEXT))
+    assert context["called"] == ["broken", "disabled", "stopper"]
+    assert context["errors"] == [("broken", "boom")]
+    assert run(message(PAT))["called"] == ["disabled", "after"]
+
+    # 配置重载后过滤条件变化，重建分发表
+    stopper.plugin_config = SimpleNamespace(enabled=True)
+    stopper.get_message_filter = lambda: MessageFilter([PAT])
+    assert run(message(TEXT))["called"] == ["broken", "disabled", "after"]
+    assert run(message(PAT))["called"] == ["disabled", "stopper"]
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试大模型调用账本
+"""
+
+import csv
+import os
+import sqlite3
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from omni_plugin_common.ledger import LEDGER_COLUMNS, UsageLedger, write_rows  # noqa: E402
+
+
+def test_aggregate_and_flush():
+    ledger = UsageLedger()
+    ledger.record("room1", "gpt", "openai/chat", 0.5, 100, 20)
+    ledger.record("room1", "gpt", "openai/chat", 1.5, 50, 10)
+    with ledger.call("room2", "dify-workflow", "dify") as entry:
+        entry.set_usage(total_tokens=300)
+    try:
+        with ledger.call("room2", "dify-workflow", "dify"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    rows = {row[2]: dict(zip(LEDGER_COLUMNS, row)) for row in ledger.drain()}
+    room1, room2 = rows["room1"], rows["room2"]
+    assert (room1["calls"], room1["prompt_tokens"], room1["completion_tokens"]) == (2, 150, 30)
+    assert room1["total_tokens"] == 180
+    assert room1["latency_max"] == 1.5 and room1["latency_sum"] == 2.0
+    assert (room2["calls"], room2["errors"], room2["total_tokens"]) == (2, 1, 300)
+    # 取出后开始新的窗口
+    assert ledger.drain() == []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = [tuple(room1.values()), tuple(room2.values())]
+        db_path = os.path.join(tmp, "usage.sqlite3")
+        write_rows(db_path, rows)
+        write_rows(db_path, rows)
+        conn = sqlite3.connect(db_path)
+        assert conn.execute(
+            "SELECT SUM(total_tokens) FROM llm_usage WHERE room = 'room1'"
+        ).fetchone() == (360,)
+        conn.close()
+
+        csv_path = os.path.join(tmp, "usage.csv")
+        write_rows(csv_path, rows)
+        write_rows(csv_path, rows)
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            lines = list(csv.reader(f))
+        assert lines[0] == list(LEDGER_COLUMNS) and len(lines) == 5
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试指标统计
+"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from omni_plugin_common.metrics import (  # noqa: E402
+    Histogram,
+    MetricsRegistry,
+    REGISTRY,
+    instrument_plugin,
+    mark_failed,
+    track_call,
+)
+
+
+class FakeContext:
+    def __init__(self, mode="skip"):
+        self.mode = mode
+        self.responses = []
+        self.should_stop = False
+
+    def get_responses(self):
+        return self.responses
+
+
+class FakePlugin:
+    name = "fake-plugin"
+
+    def get_plugin_name(self):
+        return self.name
+
+    @instrument_plugin
+    async def handle_message(self, context):
+        if context.mode == "fail":
+            raise ValueError("boom")
+        if context.mode == "caught":
+            # 插件内部捕获了异常，仍然回复了兜底内容
+            mark_failed(self.name)
+            context.responses.append("fallback")
+        if context.mode == "reply":
+            context.responses.append("ok")
+
+
+def test_histogram_quantile():
+    h = Histogram(buckets=(1, 2, 4))
+    for v in (0.5, 1.5, 1.5, 3, 10):
+        h.observe(v)
+    assert h.count == 5
+    assert h.counts == [1, 2, 1, 1]
+    assert 1 <= h.quantile(0.5) <= 2
+    assert h.quantile(1.0) == 4
+
+
+def test_instrument_plugin_outcomes():
+    REGISTRY.reset()
+    plugin = FakePlugin()
+    asyncio.run(plugin.handle_message(FakeContext("skip")))
+    asyncio.run(plugin.handle_message(FakeContext("reply")))
+    try:
+        asyncio.run(plugin.handle_message(FakeContext("fail")))
+    except ValueError:
+        pass
+    asyncio.run(plugin.handle_message(FakeContext("caught")))
+    # 在其他插件处理期间调用（惰性生产者）时直接计入
+    mark_failed("lazy-plugin")
+    with track_call("fake-plugin", "remote"):
+        pass
+    text = REGISTRY.render_prometheus()
+    assert 'omni_plugin_messages_total{outcome="handled",plugin="fake-plugin"} 1' in text
+    assert 'omni_plugin_messages_total{outcome="skipped",plugin="fake-plugin"} 1' in text
+    assert 'omni_plugin_messages_total{outcome="failed",plugin="fake-plugin"} 2' in text
+    assert 'omni_plugin_messages_total{outcome="failed",plugin="lazy-plugin"} 1' in text
+    assert 'omni_plugin_handle_seconds_count{plugin="fake-plugin"} 4' in text
+    assert 'omni_plugin_external_call_seconds_count{call="remote",plugin="fake-plugin"} 1' in text
+    assert "[fake-plugin] n=4" in REGISTRY.format_summary()
+    REGISTRY.reset()
+
+
+def test_label_escape():
+    registry = MetricsRegistry()
+    registry.inc("x_total", (("room", 'a"b'),))
+    assert 'x_total{room="a\\"b"} 1' in registry.render_prometheus()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试连接池配置和 Dify 预热
+"""
+
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from omni_plugin_common.pool_config import PoolConfig, start_dify_keep_warm  # noqa: E402
+
+
+class FakeConfig(PoolConfig):
+    dify_base_url: str = "http://dify"
+
+
+class FakeDifyClient:
+    def __init__(self):
+        self.warm_calls = []
+
+    def start_keep_warm(self, connections, probe_interval):
+        self.warm_calls.append((connections, probe_interval))
+        return "stop-event"
+
+
+class FakePlugin:
+    def __init__(self, enabled, **config):
+        self.enabled = enabled
+        self.plugin_config = FakeConfig(**config)
+        self.created = 0
+
+    @property
+    def dify_client(self):
+        self.created += 1
+        return FakeDifyClient()
+
+
+def test_keep_warm_only_when_configured():
+    config = FakeConfig()
+    assert (config.max_connections, config.warm_connections) == (10, 0)
+    # 默认不预热，也不创建客户端
+    for plugin in (
+        FakePlugin(True),
+        FakePlugin(False, warm_connections=2),
+        FakePlugin(True, warm_connections=2, dify_base_url=""),
+    ):
+        assert start_dify_keep_warm(plugin) is None
+        assert plugin.created == 0
+    plugin = FakePlugin(True, warm_connections=2, probe_interval=30)
+    assert start_dify_keep_warm(plugin) == "stop-event"
+    assert plugin.created == 1
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试按会话并发调度
+"""
+
+import asyncio
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from omni_plugin_common.scheduler import (  # noqa: E402
+    OVERFLOW_REJECT,
+    ConversationScheduler,
+)
+
+
+def message(room, seq):
+    return SimpleNamespace(
+        is_chatroom=True, room=SimpleNamespace(username=room), contact=None, seq=seq
+    )
+
+
+def test_ordered_per_conversation_and_concurrent_across():
+    order = []
+    running = set()
+    overlap = []
+
+    async def process(msg, context):
+        running.add(msg.room.username)
+        overlap.append(len(running))
+        await asyncio.sleep(0.01 if msg.room.username == "slow" else 0.001)
+        running.discard(msg.room.username)
+        order.append((msg.room.username, msg.seq))
+        return [msg.seq]
+
+    async def run():
+        scheduler = ConversationScheduler(process, workers=2)
+        futures = [scheduler.submit(message("slow", i), {}) for i in range(3)]
+        futures += [scheduler.submit(message("fast", i), {}) for i in range(3)]
+        results = await asyncio.gather(*futures)
+        await scheduler.close()
+        return results
+
+    results = asyncio.run(run())
+    assert results == [[0], [1], [2], [0], [1], [2]]
+    assert [s for r, s in order if r == "slow"] == [0, 1, 2]
+    assert [s for r, s in order if r == "fast"] == [0, 1, 2]
+    # fast 会话不需要等待 slow 会话全部完成
+    assert order.index(("fast", 2)) < order.index(("slow", 2))
+    assert max(overlap) == 2
+
+
+def test_queue_limit():
+    async def process(msg, context):
+        await asyncio.sleep(0.001)
+        return [msg.seq]
+
+    async def run(overflow=None):
+        kwargs = {"overflow": overflow} if overflow else {}
+        scheduler = ConversationScheduler(
+            process, workers=1, max_queue_per_conversation=2, **kwargs
+        )
+        futures = [scheduler.submit(message("r", i), {}) for i in range(4)]
+        results = await asyncio.gather(*futures)
+        await scheduler.close()
+        return results
+
+    assert asyncio.run(run()) == [[], [], [2], [3]]
+    assert asyncio.run(run(OVERFLOW_REJECT)) == [[0], [1], [], []]
+
+
+def test_cancelled_message_keeps_worker():
+    async def process(msg, context):
+        if msg.seq == 0:
+            task = asyncio.ensure_future(asyncio.sleep(10))
+            task.cancel()
+            await task
+        return [msg.seq]
+
+    async def run():
+        scheduler = ConversationScheduler(process, workers=1)
+        futures = [scheduler.submit(message(room, i), {}) for room in "ab" for i in range(2)]
+        results = await asyncio.wait_for(asyncio.gather(*futures), 1)
+        pending = scheduler.pending()
+        scheduled = set(scheduler._scheduled)
+        await scheduler.close()
+        return results, pending, scheduled
+
+    results, pending, scheduled = asyncio.run(run())
+    assert results == [[], [1], [], [1]]
+    assert pending == 0
+    assert scheduled == set()
@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试插件启动耗时统计
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from omni_plugin_common.metrics import REGISTRY  # noqa: E402
+from omni_plugin_common.startup import (  # noqa: E402
+    STARTUP_SECONDS,
+    format_profile,
+    profile_plugin,
+)
+
+
+def test_profile_plugin():
+    REGISTRY.reset()
+    row = profile_plugin("demo", "collections:Counter", lambda: "bot")
+    assert row["error"] is None
+    assert row["import"] >= 0 and row["init"] >= 0
+    _, histograms = REGISTRY.snapshot()
+    phases = {dict(labels)["phase"] for name, labels in histograms if name == STARTUP_SECONDS}
+    assert phases == {"import", "init"}
+
+    # 只导入不实例化
+    row = profile_plugin("demo", "collections:Counter")
+    assert row["init"] is None
+
+    row = profile_plugin("missing", "no_such_module_xyz:Plugin", lambda: "bot")
+    assert row["import"] is None and "ModuleNotFoundError" in row["error"]
+    assert "missing" in format_profile([row])
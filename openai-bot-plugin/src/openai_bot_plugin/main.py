@@ -1,8 +1,9 @@
+import asyncio
+import json
+import threading
 import time
 from typing import Optional
 
-import openai
-from pydantic import BaseModel
 from omni_bot_sdk.plugins.interface import (
     Bot,
     Plugin,
@@ -11,9 +12,28 @@ from omni_bot_sdk.plugins.interface import (
     MessageType,
     SendTextMessageAction,
 )
+from omni_plugin_common.context_keys import (
+    CHAT_HISTORY,
+    CHAT_SUMMARY,
+    NOT_FOR_BOT,
+    RELATED_HISTORY,
+)
+from omni_plugin_common.admission import AdmissionPolicy
+from omni_plugin_common.dispatch import MessageFilter
+from omni_plugin_common.ledger import LEDGER
+from omni_plugin_common.metrics import (
+    REGISTRY,
+    instrument_plugin,
+    mark_failed,
+    track_call,
+)
+from omni_plugin_common.pool_config import PoolConfig
+from omni_plugin_common.scheduler import conversation_key
+
+SPECULATION_RESULTS = "omni_plugin_openai_speculation_total"
 
 
-class OpenAIBotPluginConfig(BaseModel):
+class OpenAIBotPluginConfig(PoolConfig):
     """
     OpenAI Bot 插件配置
     enabled: 是否启用该插件
@@ -21,7 +41,13 @@ class OpenAIBotPluginConfig(BaseModel):
     openai_base_url: OpenAI API基础URL
     openai_model: OpenAI模型名称
     priority: 插件优先级，数值越大优先级越高
-    prompt: 系统提示词，支持 {{chat_history}}、{{time_now}}、{{self_nickname}}、{{room_nickname}}、{{contact_nickname}} 变量占位符
+    prompt: 系统提示词，支持 {{chat_history}}、{{chat_summary}}、{{related_history}}、{{time_now}}、{{self_nickname}}、{{room_nickname}}、{{contact_nickname}} 变量占位符
+    history_turns: {{chat_history}} 只保留最近的消息条数，0 表示不裁剪
+    max_message_age: 消息创建超过多少秒后不再回复，0 表示不限制
+    max_backlog: 调度器积压的消息达到多少条时不再回复，0 表示不限制
+    speculative: 是否在 bot-check 判断的同时提前生成回复，判断为 not_for_bot 时取消生成
+    speculative_max_inflight: 同时进行的提前生成数上限，超出后退回先判断再生成
+    连接池字段见 PoolConfig，warm_connections 大于 0 时在收到第一条消息后预热到 openai_base_url 的连接
     """
 
     enabled: bool = False
@@ -33,6 +59,11 @@ class OpenAIBotPluginConfig(BaseModel):
         "你是一个聊天机器人，请根据用户的问题给出回答。历史对话：{{chat_history}} 当前时间：{{time_now}} "
         "你的昵称：{{self_nickname}} 群昵称：{{room_nickname}} 消息来自于：{{contact_nickname}}"
     )
+    history_turns: int = 0
+    max_message_age: float = 0
+    max_backlog: int = 0
+    speculative: bool = False
+    speculative_max_inflight: int = 4
 
 
 class OpenAIBotPlugin(Plugin):
@@ -52,10 +83,95 @@ class OpenAIBotPlugin(Plugin):
         self.priority = getattr(self.plugin_config, "priority", self.__class__.priority)
         self.user = bot.user_info
         self.prompt = self.plugin_config.prompt
-        openai.api_key = self.api_key
-        openai.base_url = self.base_url
+        self.history_turns = self.plugin_config.history_turns
+        self.admission = AdmissionPolicy(
+            max_age=self.plugin_config.max_message_age,
+            max_backlog=self.plugin_config.max_backlog,
+        )
+        self.message_filter = MessageFilter(
+            message_types=(MessageType.Text, MessageType.Quote)
+        )
+        self.speculative = self.plugin_config.speculative
+        self.speculative_max_inflight = self.plugin_config.speculative_max_inflight
+        self._speculative_inflight = 0
+        self._keep_warm_task = None
+        self._client = None
+        self.http_client = None
+        self._client_lock = threading.Lock()
+        if self.enabled:
+            # 导入 openai 需要接近一秒，启用时在后台线程创建客户端，不阻塞启动，也不计入第一次回复的耗时
+            threading.Thread(
+                target=self._build_client, name="openai-client-init", daemon=True
+            ).start()
+
+    def _build_client(self):
+        """
+        只导入 openai 并创建一次客户端，不修改 openai 模块的全局配置
+        使用异步客户端，取消生成时会直接断开请求
+        """
+        with self._client_lock:
+            if self._client is None:
+                import openai
+                from omni_plugin_common.http_pool import pooled_async_client
+
+                self.http_client = pooled_async_client(
+                    f"{self.name}/openai",
+                    max_connections=self.plugin_config.max_connections,
+                    keepalive_expiry=self.plugin_config.keepalive_expiry,
+                )
+                self._client = openai.AsyncOpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    http_client=self.http_client,
+                )
+            return self._client
+
+    async def _get_client(self):
+        """
+        后台创建还没完成时在线程中等待，不阻塞事件循环
+        """
+        if self._client is not None:
+            return self._client
+        return await asyncio.to_thread(self._build_client)
 
-    def get_ai_response(self, msg, chat_history) -> Optional[str]:
+    def _ensure_keep_warm(self):
+        """
+        异步客户端的连接绑定在事件循环上，只能在收到第一条消息后在同一个循环中预热
+        群聊中大部分消息不需要回复，通常在第一次回复之前连接就已经建立好了
+        """
+        if self._keep_warm_task is not None or self.plugin_config.warm_connections <= 0:
+            return
+        from omni_plugin_common.http_pool import keep_warm_async
+
+        async def _run():
+            # 客户端和连接池在后台线程中创建，等创建完成后再预热同一个连接池
+            await self._get_client()
+            await keep_warm_async(
+                self.http_client,
+                self.base_url,
+                self.plugin_config.warm_connections,
+                self.plugin_config.probe_interval,
+            )
+
+        self._keep_warm_task = asyncio.create_task(_run())
+
+    def _trim_history(self, chat_history: str) -> str:
+        """
+        只保留最近 history_turns 条消息，更早的内容交给 {{related_history}} 按需检索
+        """
+        if not chat_history or self.history_turns <= 0:
+            return chat_history
+        try:
+            history = json.loads(chat_history)
+        except ValueError:
+            return chat_history
+        if not isinstance(history, list) or len(history) <= self.history_turns:
+            return chat_history
+        return json.dumps(history[-self.history_turns :], ensure_ascii=False)
+
+    async def get_ai_response(
+        self, msg, chat_history, related_history="", chat_summary=""
+    ) -> Optional[str]:
         if not self.enabled:
             return None
         try:
@@ -73,7 +189,13 @@ class OpenAIBotPlugin(Plugin):
             time_now = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
             system_prompt = self.prompt
             system_prompt = system_prompt.replace(
-                "{{chat_history}}", chat_history or ""
+                "{{chat_history}}", self._trim_history(chat_history) or ""
+            )
+            system_prompt = system_prompt.replace(
+                "{{related_history}}", related_history or ""
+            )
+            system_prompt = system_prompt.replace(
+                "{{chat_summary}}", chat_summary or ""
             )
             system_prompt = system_prompt.replace("{{time_now}}", time_now)
             # 下面变量由用户手动创建和传递，这里默认字符串
@@ -88,56 +210,130 @@ class OpenAIBotPlugin(Plugin):
             )
             messages.append({"role": "system", "content": system_prompt})
             messages.append({"role": "user", "content": content})
-            response = openai.chat.completions.create(
-                model=self.model,
-                messages=messages,
-                user=msg.room.username if msg.is_chatroom else msg.contact.username,
-            )
+            # 在计时之外取得客户端，创建客户端的耗时不计入接口耗时和账本
+            client = await self._get_client()
+            with track_call(self.name, "openai_chat_completion"), LEDGER.call(
+                conversation_key(msg), self.model, f"{self.name}/chat_completion"
+            ) as entry:
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=messages,
+                    user=msg.room.username if msg.is_chatroom else msg.contact.username,
+                )
+                if response.usage:
+                    entry.set_usage(
+                        response.usage.prompt_tokens,
+                        response.usage.completion_tokens,
+                        response.usage.total_tokens,
+                    )
             # OpenAI 返回格式
             answer = response.choices[0].message.content.strip()
             return answer
         except Exception as e:
             self.logger.error(f"获取AI响应时出错: {e}")
+            mark_failed(self.name)
             return None
 
     def get_priority(self) -> int:
         return self.priority
 
+    def get_message_filter(self) -> MessageFilter:
+        return self.message_filter
+
+    async def _generate_reply(self, message, plusginExcuteContext: PluginExcuteContext) -> Optional[str]:
+        chat_history = CHAT_HISTORY.get(plusginExcuteContext)
+        chat_summary = CHAT_SUMMARY.get(plusginExcuteContext)
+        related_history = ""
+        if "{{related_history}}" in self.prompt:
+            # 只有 prompt 用到时才检索长期聊天记录
+            related_history = await RELATED_HISTORY.aget(plusginExcuteContext)
+        return await self.get_ai_response(
+            msg=message,
+            chat_history=chat_history,
+            related_history=related_history,
+            chat_summary=chat_summary,
+        )
+
+    def _can_speculate(self, plusginExcuteContext: PluginExcuteContext) -> bool:
+        if not self.speculative or not NOT_FOR_BOT.is_pending(plusginExcuteContext):
+            # 没有 bot-check 或者已经有结果，不需要提前生成
+            return False
+        if self._speculative_inflight >= self.speculative_max_inflight:
+            REGISTRY.inc(SPECULATION_RESULTS, (("result", "over_budget"),))
+            return False
+        return True
+
+    def _release_speculation(self, task: asyncio.Task):
+        self._speculative_inflight -= 1
+
+    async def _speculative_reply(self, message, plusginExcuteContext: PluginExcuteContext):
+        """
+        生成回复和 not_for_bot 判断同时进行，返回 (not_for_bot, 回复)
+        判断为 not_for_bot 时取消生成，回复为 None
+        """
+        self._speculative_inflight += 1
+        reply_task = asyncio.create_task(self._generate_reply(message, plusginExcuteContext))
+        reply_task.add_done_callback(self._release_speculation)
+        try:
+            not_for_bot = await NOT_FOR_BOT.aget(plusginExcuteContext)
+        except BaseException:
+            reply_task.cancel()
+            raise
+        if not_for_bot:
+            reply_task.cancel()
+            REGISTRY.inc(SPECULATION_RESULTS, (("result", "cancelled"),))
+            return True, None
+        REGISTRY.inc(SPECULATION_RESULTS, (("result", "used"),))
+        try:
+            return False, await reply_task
+        except BaseException:
+            # 调用方被取消时，提前生成的任务也要一起取消
+            reply_task.cancel()
+            raise
+
+    def _is_mentioned(self, message) -> bool:
+        """
+        群聊消息是否 @ 了机器人，或者引用了机器人的消息
+        """
+        if message.local_type == MessageType.Text:
+            return bool(message.is_at)
+        if message.local_type == MessageType.Quote:
+            return bool(message.quote_message and message.quote_message.is_self)
+        return False
+
+    @instrument_plugin
     async def handle_message(self, plusginExcuteContext: PluginExcuteContext) -> None:
         """
         处理接收到的消息
         文本消息，引用消息处理，其他都先不处理
         文本消息要判断是不是 at 我，或者是不是引用了我
-        前面的上下文插件会在上下文中添加 not_for_bot 字段，如果为True，则不进行AI回复
+        前面的 bot-check 插件会登记 not_for_bot，这里读取时才真正判断，如果为True，则不进行AI回复
         """
         if not self.enabled:
             return
+        self._ensure_keep_warm()
         message = plusginExcuteContext.get_message()
-        if (
-            message.local_type != MessageType.Text
-            and message.local_type != MessageType.Quote
-        ):
+        if not self.message_filter.matches(message):
             return
-        context = plusginExcuteContext.get_context()
-        not_for_bot = context.get("not_for_bot", False)
+        # 增加判断条件，如果是私聊，直接可以响应，如果是群聊，必须引用或者@
+        # 先做本地判断，不满足时不读取 not_for_bot，也就不会触发 bot-check 的远程判断
+        if message.is_chatroom and not self._is_mentioned(message):
+            return
+        # 积压恢复期间过时的消息不再回复，也不会触发 bot-check 的远程判断
+        if not self.admission.admit(self.name, message):
+            return
+        speculated = self._can_speculate(plusginExcuteContext)
+        if speculated:
+            not_for_bot, response = await self._speculative_reply(message, plusginExcuteContext)
+        else:
+            not_for_bot = await NOT_FOR_BOT.aget(plusginExcuteContext)
         if (
             not_for_bot
         ):  # 用户可能没有前置判断流程，这里需要采用一般逻辑，也就是私聊消息全部回复，群聊消息除了@和引用不回复，这是典型的机器人特征
             return
-        chat_history = context.get("chat_history", "")
-        # 增加判断条件，如果是私聊，直接可以响应，如果是群聊，必须引用或者@
+        if not speculated:
+            response = await self._generate_reply(message, plusginExcuteContext)
         if message.is_chatroom:
-            if message.local_type == MessageType.Text:
-                if message.is_at:
-                    pass
-                else:
-                    return
-            elif message.local_type == MessageType.Quote:
-                if message.quote_message and message.quote_message.is_self:
-                    pass
-                else:
-                    return
-            response = self.get_ai_response(msg=message, chat_history=chat_history)
             if message.local_type == MessageType.Quote:
                 search_text = message.content
             else:
@@ -165,7 +361,6 @@ class OpenAIBotPlugin(Plugin):
             )
         else:
             # 私聊的消息，直接使用Dify的工作流回复
-            response = self.get_ai_response(msg=message, chat_history=chat_history)
             plusginExcuteContext.add_response(
                 PluginExcuteResponse(
                     message=message,
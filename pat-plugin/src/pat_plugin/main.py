@@ -1,3 +1,4 @@
+import asyncio
 import time
 from omni_bot_sdk.plugins.interface import (
     Bot,
@@ -7,6 +8,10 @@ from omni_bot_sdk.plugins.interface import (
     MessageType,
     PatAction,
 )
+from omni_plugin_common.admission import AdmissionPolicy
+from omni_plugin_common.context_keys import USER
+from omni_plugin_common.dispatch import MessageFilter
+from omni_plugin_common.metrics import instrument_plugin, track_call
 from pydantic import BaseModel
 
 
@@ -15,10 +20,14 @@ class PatPluginConfig(BaseModel):
     拍一拍插件配置
     enabled: 是否启用该插件
     priority: 插件优先级，数值越大优先级越高
+    max_message_age: 消息创建超过多少秒后不再回拍，0 表示不限制
+    max_backlog: 调度器积压的消息达到多少条时不再回拍，0 表示不限制
     """
 
     enabled: bool = False
     priority: int = 900
+    max_message_age: float = 0
+    max_backlog: int = 0
 
 
 class PatPlugin(Plugin):
@@ -42,10 +51,19 @@ class PatPlugin(Plugin):
         self.enabled = self.plugin_config.enabled
         # 动态优先级支持
         self.priority = getattr(self.plugin_config, "priority", self.__class__.priority)
+        self.message_filter = MessageFilter(message_types=(MessageType.Pat,))
+        self.admission = AdmissionPolicy(
+            max_age=self.plugin_config.max_message_age,
+            max_backlog=self.plugin_config.max_backlog,
+        )
 
     def get_priority(self) -> int:
         return self.priority
 
+    def get_message_filter(self) -> MessageFilter:
+        return self.message_filter
+
+    @instrument_plugin
     async def handle_message(self, plusginExcuteContext: PluginExcuteContext) -> None:
         """
         处理接收到的消息
@@ -61,9 +79,11 @@ class PatPlugin(Plugin):
                 - handled: 是否已处理标志
         """
         message = plusginExcuteContext.get_message()
-        if message.local_type == MessageType.Pat:
+        if self.message_filter.matches(message) and self.admission.admit(
+            self.name, message
+        ):
             context = plusginExcuteContext.get_context()
-            user = context.get("user")
+            user = USER.get(context)
             if message.patted_username != user.account:
                 self.logger.info("不是拍自己，忽略消息")
                 return
@@ -82,14 +102,17 @@ class PatPlugin(Plugin):
                     return
             self.user_pat_record[message.contact.display_name] = time.time()
             # 从数据库中查找最后10条消息，是否包含当前用户
-            rows = self.db.get_messages_by_username(
-                message_db_path=message.message_db_path,
-                username=(
-                    message.room.username
-                    if message.is_chatroom
-                    else message.contact.username
-                ),
-            )
+            # 同步的 SQLite 查询放到线程中执行，不阻塞其他会话的消息处理
+            with track_call(self.name, "db_get_messages"):
+                rows = await asyncio.to_thread(
+                    self.db.get_messages_by_username,
+                    message_db_path=message.message_db_path,
+                    username=(
+                        message.room.username
+                        if message.is_chatroom
+                        else message.contact.username
+                    ),
+                )
             # 这里用id不行，因为和联系人表里面的id是对应不上的，必须要用username
             rows = [r for r in rows if r[17] == message.contact.username]
             if len(rows) == 0:
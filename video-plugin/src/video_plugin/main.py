@@ -1,3 +1,9 @@
+import asyncio
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
 from omni_bot_sdk.plugins.interface import (
     Bot,
     Plugin,
@@ -6,18 +12,33 @@ from omni_bot_sdk.plugins.interface import (
     MessageType,
     DownloadVideoAction,
 )
+from omni_plugin_common.context_keys import VIDEO_METADATA
+from omni_plugin_common.dispatch import MessageFilter
+from omni_plugin_common.metrics import instrument_plugin, track_call
 from pydantic import BaseModel
 
+from .mp4_meta import Mp4ParseError, parse_mp4_metadata
+
 
 class VideoPluginConfig(BaseModel):
     """
     视频插件配置
     enabled: 是否启用该插件
     priority: 插件优先级，数值越大优先级越高
+    metadata_enabled: 是否在下载后解析视频元数据（只读容器头，不解码）
+    metadata_workers: 元数据解析线程数，避免大文件IO阻塞事件循环
+    metadata_wait_timeout: 等待视频下载完成的最长时间（秒）
+    metadata_poll_interval: 检查视频文件是否下载完成的间隔（秒），文件大小连续两次不变才认为下载完成
+    metadata_cache_size: 缓存的元数据条数
     """
 
     enabled: bool = False
     priority: int = 100
+    metadata_enabled: bool = True
+    metadata_workers: int = 2
+    metadata_wait_timeout: float = 120
+    metadata_poll_interval: float = 1.0
+    metadata_cache_size: int = 256
 
 
 class VideoPlugin(Plugin):
@@ -29,6 +50,11 @@ class VideoPlugin(Plugin):
     - 下载视频文件到本地存储
     - 处理视频文件的元数据信息
 
+    元数据：
+    - 视频在插件链结束后才由 DownloadVideoAction 下载，解析在后台等待下载完成后进行，
+      结果只进入缓存，通过 get_video_metadata / wait_video_metadata 按路径查询
+    - 处理消息时文件已经存在（缓存命中或重复下载）才会同时写入上下文 video_metadata
+
     注意事项：
     - 该插件应配置为较高优先级，确保视频文件能够被及时处理
     - 需要确保有足够的存储空间用于视频文件下载
@@ -43,10 +69,125 @@ class VideoPlugin(Plugin):
         self.enabled = self.plugin_config.enabled
         # 动态优先级支持
         self.priority = getattr(self.plugin_config, "priority", self.__class__.priority)
+        self.message_filter = MessageFilter(message_types=(MessageType.Video,))
+        self.data_dir = self.bot.user_info.data_dir
+        self.metadata_enabled = self.plugin_config.metadata_enabled
+        self.metadata_wait_timeout = self.plugin_config.metadata_wait_timeout
+        self.metadata_poll_interval = self.plugin_config.metadata_poll_interval
+        self.metadata_cache_size = self.plugin_config.metadata_cache_size
+        # 路径 -> 元数据，供后续插件按路径查询
+        self.metadata_cache: OrderedDict[str, dict] = OrderedDict()
+        # 路径 -> 后台解析任务，同一个视频只解析一次
+        self._metadata_tasks: Dict[str, asyncio.Task] = {}
+        self._executor = None
+        if self.enabled and self.metadata_enabled:
+            self._executor = ThreadPoolExecutor(
+                max_workers=max(1, self.plugin_config.metadata_workers),
+                thread_name_prefix="video-metadata",
+            )
 
     def get_priority(self) -> int:
         return self.priority
 
+    def get_message_filter(self) -> MessageFilter:
+        return self.message_filter
+
+    def get_video_metadata(self, video_path: str) -> Optional[dict]:
+        """
+        查询已经解析过的视频元数据
+        """
+        return self.metadata_cache.get(video_path)
+
+    async def wait_video_metadata(
+        self, video_path: str, timeout: Optional[float] = None
+    ) -> Optional[dict]:
+        """
+        等待视频下载完成并解析，没有对应的后台任务或者超时时返回缓存中的结果（可能为 None）
+        """
+        task = self._metadata_tasks.get(video_path)
+        if task is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(task), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.metadata_cache.get(video_path)
+
+    def _cache_metadata(self, video_path: str, metadata: dict):
+        self.metadata_cache[video_path] = metadata
+        self.metadata_cache.move_to_end(video_path)
+        while len(self.metadata_cache) > self.metadata_cache_size:
+            self.metadata_cache.popitem(last=False)
+
+    async def _parse_in_executor(
+        self, video_path: str, log_failure: bool = True
+    ) -> Optional[dict]:
+        loop = asyncio.get_running_loop()
+        try:
+            with track_call(self.name, "metadata_parse"):
+                metadata = await loop.run_in_executor(
+                    self._executor, parse_mp4_metadata, video_path
+                )
+        except (Mp4ParseError, OSError) as e:
+            if log_failure:
+                self.logger.warning(f"解析视频元数据失败: {video_path}, {e}")
+            return None
+        result = metadata.to_dict()
+        self._cache_metadata(video_path, result)
+        self.logger.info(f"视频元数据: {video_path}, {result}")
+        return result
+
+    def _file_size(self, video_path: str) -> int:
+        try:
+            return os.path.getsize(video_path)
+        except OSError:
+            return -1
+
+    async def _wait_and_parse(self, video_path: str):
+        """
+        后台等待视频下载完成后再解析，不阻塞消息链
+        文件大小在一个检查间隔内不再变化才解析；moov 在文件末尾时下载过程中会解析失败，
+        失败后继续等待文件变化重试，直到超时
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.metadata_wait_timeout
+        last_size = -1
+        parsed_size = -1
+        while loop.time() < deadline:
+            size = self._file_size(video_path)
+            if size > 0 and size == last_size and size != parsed_size:
+                if await self._parse_in_executor(video_path, log_failure=False):
+                    return
+                parsed_size = size
+            last_size = size
+            await asyncio.sleep(self.metadata_poll_interval)
+        if last_size < 0:
+            self.logger.info(f"等待视频下载超时，跳过元数据解析: {video_path}")
+        else:
+            # 最后一次带日志地解析，记录失败原因
+            await self._parse_in_executor(video_path)
+
+    async def _extract_metadata(self, message, context: dict):
+        if not getattr(message, "path", None):
+            return
+        video_path = os.path.join(self.data_dir, message.path)
+        cached = self.metadata_cache.get(video_path)
+        if cached:
+            VIDEO_METADATA.set(context, cached)
+            return
+        if video_path in self._metadata_tasks:
+            return
+        if os.path.exists(video_path):
+            # 已经下载过，只读容器头，耗时很短，直接给后续插件使用
+            metadata = await self._parse_in_executor(video_path, log_failure=False)
+            if metadata:
+                VIDEO_METADATA.set(context, metadata)
+                return
+        # 视频在插件链结束后才下载，结果只写入缓存，后续插件通过 wait_video_metadata 获取
+        task = asyncio.create_task(self._wait_and_parse(video_path))
+        self._metadata_tasks[video_path] = task
+        task.add_done_callback(lambda _: self._metadata_tasks.pop(video_path, None))
+
+    @instrument_plugin
     async def handle_message(self, context: PluginExcuteContext) -> None:
         """
         处理接收到的消息，识别并下载视频文件
@@ -54,7 +195,7 @@ class VideoPlugin(Plugin):
         if not self.enabled:
             return
         message = context.get_message()
-        if message.local_type == MessageType.Video:
+        if self.message_filter.matches(message):
             context.add_response(
                 PluginExcuteResponse(
                     plugin_name=self.name,
@@ -68,6 +209,8 @@ class VideoPlugin(Plugin):
                     ],
                 )
             )
+            if self._executor:
+                await self._extract_metadata(message, context.get_context())
 
     def get_plugin_name(self) -> str:
         return self.name
@@ -0,0 +1,182 @@
+"""
+MP4 / MOV 容器头解析
+
+只按 box 头部在文件中跳转，读取 moov 中的 mvhd / tkhd / hdlr / stsd，
+不会读取 mdat，也不做任何解码，大文件同样只需要几次 seek + 少量读取。
+"""
+
+import os
+import struct
+from dataclasses import asdict, dataclass
+from typing import BinaryIO, Iterator, Optional, Tuple
+
+# moov 一般只有几十 KB 到几 MB，超过这个大小认为文件异常，不再解析
+MAX_MOOV_SIZE = 32 * 1024 * 1024
+
+# 需要继续向下查找的容器 box
+_CONTAINER_BOXES = {b"trak", b"mdia", b"minf", b"stbl"}
+
+
+class Mp4ParseError(Exception):
+    """容器头解析失败"""
+
+
+@dataclass
+class VideoMetadata:
+    """
+    视频元数据
+    duration: 时长（秒）
+    width / height: 视频轨分辨率
+    video_codec / audio_codec: 编码 fourcc，如 avc1、hvc1、mp4a
+    file_size: 文件大小（字节）
+    brand: ftyp 中的 major brand
+    """
+
+    duration: float = 0.0
+    width: int = 0
+    height: int = 0
+    video_codec: str = ""
+    audio_codec: str = ""
+    file_size: int = 0
+    brand: str = ""
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _iter_file_boxes(f: BinaryIO, file_size: int) -> Iterator[Tuple[bytes, int, int]]:
+    """
+    遍历文件顶层 box，返回 (类型, 数据起始偏移, 数据长度)，不读取 box 内容
+    """
+    offset = 0
+    while offset + 8 <= file_size:
+        f.seek(offset)
+        header = f.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack(">I4s", header)
+        header_size = 8
+        if size == 1:
+            large = f.read(8)
+            if len(large) < 8:
+                return
+            size = struct.unpack(">Q", large)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        if size < header_size:
+            raise Mp4ParseError(f"box {box_type!r} 大小非法: {size}")
+        yield box_type, offset + header_size, size - header_size
+        offset += size
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """
+    遍历内存中 box 的子 box，返回 (类型, 数据起始偏移, 数据结束偏移)
+    """
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack_from(">I4s", data, offset)
+        header_size = 8
+        if size == 1:
+            if offset + 16 > end:
+                return
+            size = struct.unpack_from(">Q", data, offset + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - offset
+        if size < header_size or offset + size > end:
+            return
+        yield box_type, offset + header_size, offset + size
+        offset += size
+
+
+def _parse_mvhd(data: bytes, start: int) -> float:
+    version = data[start]
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", data, start + 20)
+    else:
+        timescale, duration = struct.unpack_from(">II", data, start + 12)
+    return duration / timescale if timescale else 0.0
+
+
+def _parse_tkhd(data: bytes, start: int) -> Tuple[int, int]:
+    version = data[start]
+    # version(1) + flags(3) + 时间/轨道字段 + reserved(8) + layer/alt/volume/reserved(8) + matrix(36)
+    offset = start + 4 + (32 if version == 1 else 20) + 8 + 8 + 36
+    width, height = struct.unpack_from(">II", data, offset)
+    # 16.16 定点数
+    return width >> 16, height >> 16
+
+
+def _parse_trak(data: bytes, start: int, end: int, meta: VideoMetadata):
+    width = height = 0
+    handler = b""
+    codec = b""
+    stack = [(start, end)]
+    while stack:
+        s, e = stack.pop()
+        for box_type, box_start, box_end in _iter_boxes(data, s, e):
+            if box_type in _CONTAINER_BOXES:
+                stack.append((box_start, box_end))
+            elif box_type == b"tkhd":
+                width, height = _parse_tkhd(data, box_start)
+            elif box_type == b"hdlr":
+                handler = data[box_start + 8 : box_start + 12]
+            elif box_type == b"stsd":
+                # version/flags(4) + entry_count(4) + 第一个 sample entry 的 size(4) + type(4)
+                codec = data[box_start + 12 : box_start + 16]
+    codec_name = codec.decode("latin-1").strip()
+    if handler == b"vide" and not meta.video_codec:
+        meta.video_codec = codec_name
+        meta.width, meta.height = width, height
+    elif handler == b"soun" and not meta.audio_codec:
+        meta.audio_codec = codec_name
+
+
+def parse_mp4_metadata(path: str) -> VideoMetadata:
+    """
+    解析 MP4/MOV 文件的容器头，获取时长、分辨率、编码和大小
+
+    Args:
+        path: 视频文件路径
+
+    Returns:
+        VideoMetadata
+
+    Raises:
+        Mp4ParseError: 文件不是合法的 MP4、moov 缺失/过大，或者文件不完整
+    """
+    try:
+        return _parse(path)
+    except (struct.error, IndexError) as e:
+        # 文件还没写完或者已经损坏，box 声明的长度超出了实际数据
+        raise Mp4ParseError(f"容器头内容损坏: {e}") from e
+
+
+def _parse(path: str) -> VideoMetadata:
+    file_size = os.path.getsize(path)
+    meta = VideoMetadata(file_size=file_size)
+    with open(path, "rb") as f:
+        moov = None
+        for box_type, data_start, data_size in _iter_file_boxes(f, file_size):
+            if box_type == b"ftyp":
+                f.seek(data_start)
+                meta.brand = f.read(4).decode("latin-1").strip()
+            elif box_type == b"moov":
+                if data_size > MAX_MOOV_SIZE:
+                    raise Mp4ParseError(f"moov 过大: {data_size}")
+                f.seek(data_start)
+                moov = f.read(data_size)
+                if len(moov) < data_size:
+                    raise Mp4ParseError(f"moov 不完整: {len(moov)}/{data_size}")
+                break
+        if moov is None:
+            raise Mp4ParseError("未找到 moov")
+    for box_type, box_start, box_end in _iter_boxes(moov):
+        if box_type == b"mvhd":
+            meta.duration = round(_parse_mvhd(moov, box_start), 3)
+        elif box_type == b"trak":
+            _parse_trak(moov, box_start, box_end, meta)
+    return meta
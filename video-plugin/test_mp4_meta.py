@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试 MP4 容器头解析
+"""
+
+import os
+import struct
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "src"))
+
+from video_plugin.mp4_meta import Mp4ParseError, parse_mp4_metadata  # noqa: E402
+
+
+def box(box_type: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", len(payload) + 8, box_type) + payload
+
+
+def full_box(box_type: bytes, payload: bytes) -> bytes:
+    return box(box_type, b"\x00\x00\x00\x00" + payload)
+
+
+def trak(handler: bytes, codec: bytes, width: int = 0, height: int = 0) -> bytes:
+    tkhd = full_box(
+        b"tkhd",
+        b"\x00" * 20 + b"\x00" * 16 + b"\x00" * 36 + struct.pack(">II", width << 16, height << 16),
+    )
+    hdlr = full_box(b"hdlr", b"\x00" * 4 + handler + b"\x00" * 12)
+    stsd = full_box(b"stsd", struct.pack(">I", 1) + box(codec, b"\x00" * 8))
+    stbl = box(b"stbl", stsd)
+    minf = box(b"minf", stbl)
+    mdia = box(b"mdia", hdlr + minf)
+    return box(b"trak", tkhd + mdia)
+
+
+def build_mp4(moov_first: bool) -> bytes:
+    ftyp = box(b"ftyp", b"isom" + b"\x00" * 4)
+    mvhd = full_box(b"mvhd", struct.pack(">IIII", 0, 0, 1000, 12500) + b"\x00" * 80)
+    moov = box(
+        b"moov", mvhd + trak(b"vide", b"avc1", 1280, 720) + trak(b"soun", b"mp4a")
+    )
+    mdat = box(b"mdat", b"\xff" * 4096)
+    return ftyp + (moov + mdat if moov_first else mdat + moov)
+
+
+def write_temp(data: bytes) -> str:
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as f:
+        f.write(data)
+        return f.name
+
+
+def test_parse_mp4_metadata():
+    for moov_first in (True, False):
+        data = build_mp4(moov_first)
+        path = write_temp(data)
+        try:
+            meta = parse_mp4_metadata(path)
+        finally:
+            os.remove(path)
+        assert meta.duration == 12.5
+        assert (meta.width, meta.height) == (1280, 720)
+        assert meta.video_codec == "avc1"
+        assert meta.audio_codec == "mp4a"
+        assert meta.file_size == len(data)
+        assert meta.brand == "isom"
+
+
+def test_parse_without_moov():
+    path = write_temp(box(b"ftyp", b"isom" + b"\x00" * 4))
+    try:
+        parse_mp4_metadata(path)
+    except Mp4ParseError:
+        pass
+    else:
+        raise AssertionError("缺少 moov 时应抛出 Mp4ParseError")
+    finally:
+        os.remove(path)
+
+
+def test_truncated_file():
+    data = build_mp4(moov_first=False)
+    # 下载到一半，moov 还没写完
+    path = write_temp(data[:-20])
+    broken = write_temp(box(b"moov", box(b"mvhd", b"")))
+    try:
+        for p in (path, broken):
+            try:
+                parse_mp4_metadata(p)
+            except Mp4ParseError:
+                pass
+            else:
+                raise AssertionError("文件不完整时应抛出 Mp4ParseError")
+    finally:
+        os.remove(path)
+        os.remove(broken)
+
+
+if __name__ == "__main__":
+    test_parse_mp4_metadata()
+    test_parse_without_moov()
+    test_truncated_file()
+    print("测试完成！")
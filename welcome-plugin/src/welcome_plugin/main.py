@@ -1,10 +1,10 @@
+import asyncio
+import functools
 import json
 import tempfile
 import re
-from typing import Optional
+from typing import List, Optional, Tuple
 
-import httpx
-from omni_bot_sdk.clients.dify_client import WorkflowClient
 from omni_bot_sdk.plugins.interface import (
     Bot,
     Plugin,
@@ -13,10 +13,15 @@ from omni_bot_sdk.plugins.interface import (
     SendImageAction,
     PluginExcuteResponse,
 )
-from pydantic import BaseModel
+from omni_plugin_common.admission import AdmissionPolicy
+from omni_plugin_common.dedup import RecentKeys, record_result
+from omni_plugin_common.dispatch import SCOPE_ROOM, MessageFilter
+from omni_plugin_common.ledger import LEDGER
+from omni_plugin_common.metrics import instrument_plugin, mark_failed, track_call
+from omni_plugin_common.pool_config import PoolConfig, start_dify_keep_warm
 
 
-class WelcomePluginConfig(BaseModel):
+class WelcomePluginConfig(PoolConfig):
     """
     欢迎插件配置
     enabled: 是否启用该插件
@@ -25,6 +30,12 @@ class WelcomePluginConfig(BaseModel):
     priority: 插件优先级，数值越大优先级越高
     all_room_allowed: 是否监听别人的加群信号
     allowed_room_list: 允许处理的群列表
+    max_message_age: 消息创建超过多少秒后不再生成欢迎海报，0 表示不限制
+    max_backlog: 调度器积压的消息达到多少条时不再生成欢迎海报，0 表示不限制
+    连接池字段见 PoolConfig，Dify 和海报下载各用一个连接池，warm_connections 大于 0 时在启动时预热到 dify_base_url 的连接
+    join_dedup_seconds: 同一次加群的 JSON 和纯文本两条消息在多少秒内只欢迎一次，0 表示不去重。
+        有成员 id 时按 (群, 成员 id) 判断，否则按 (群, 用户名)，只有海报发送成功后才记录，
+        窗口内同名用户加群、退群后再加入也会被跳过，不宜设置太长
     """
 
     enabled: bool = False
@@ -35,6 +46,9 @@ class WelcomePluginConfig(BaseModel):
     all_room_allowed: bool = False
     # 允许处理的群列表
     allowed_room_list: list[str] = []
+    max_message_age: float = 0
+    max_backlog: int = 0
+    join_dedup_seconds: float = 60
 
 
 class WelcomePlugin(Plugin):
@@ -51,15 +65,55 @@ class WelcomePlugin(Plugin):
         self.db = bot.db
         self.dify_api_key = self.plugin_config.dify_api_key
         self.dify_base_url = self.plugin_config.dify_base_url
-        self.dify_client = WorkflowClient(self.dify_api_key, self.dify_base_url)
         self.all_room_allowed = self.plugin_config.all_room_allowed
         self.allowed_room_list = self.plugin_config.allowed_room_list
+        self.admission = AdmissionPolicy(
+            max_age=self.plugin_config.max_message_age,
+            max_backlog=self.plugin_config.max_backlog,
+        )
+        # 同一次加群可能以 JSON 和纯文本两条消息出现，加群事件很少，使用精确的集合去重
+        self.joined = (
+            RecentKeys(self.plugin_config.join_dedup_seconds)
+            if self.enabled and self.plugin_config.join_dedup_seconds > 0
+            else None
+        )
+        self.keep_warm_stop_event = start_dify_keep_warm(self)
         # 动态优先级支持
         self.priority = getattr(self.plugin_config, "priority", self.__class__.priority)
+        # 只在开启了监听全部群并设置了群列表时限制群，其他情况由加群消息内容判断
+        self.message_filter = MessageFilter(
+            message_types=(MessageType.System,),
+            scope=SCOPE_ROOM,
+            allowed_rooms=(
+                self.allowed_room_list
+                if self.all_room_allowed and self.allowed_room_list
+                else None
+            ),
+        )
+
+    @functools.cached_property
+    def dify_client(self):
+        # 第一次使用时才创建客户端，未启用的插件不会创建，连接在多次调用之间复用
+        from omni_plugin_common.http_pool import dify_workflow_client
+
+        return dify_workflow_client(self.name, self.plugin_config)
+
+    @functools.cached_property
+    def download_client(self):
+        from omni_plugin_common.http_pool import pooled_async_client
+
+        return pooled_async_client(
+            f"{self.name}/download",
+            max_connections=self.plugin_config.max_connections,
+            keepalive_expiry=self.plugin_config.keepalive_expiry,
+        )
 
     def get_priority(self) -> int:
         return self.priority
 
+    def get_message_filter(self) -> MessageFilter:
+        return self.message_filter
+
     def _extract_quoted_username(self, text: str, check: bool = False) -> Optional[str]:
         """
         从文本中提取被引号包裹的真实用户名
@@ -101,24 +155,62 @@ class WelcomePlugin(Plugin):
 
         return None
 
+    def _extract_member_ids(self, node) -> List[str]:
+        """
+        从 delchatroommember 的 link.memberlist 中提取被邀请成员的 username，没有时返回空列表
+        """
+        if isinstance(node, list):
+            return [i for item in node for i in self._extract_member_ids(item)]
+        if not isinstance(node, dict):
+            return []
+        ids = []
+        for key, value in node.items():
+            if key == "memberlist":
+                members = value if isinstance(value, list) else [value]
+                for member in members:
+                    if isinstance(member, dict) and isinstance(member.get("username"), str):
+                        ids.append(member["username"])
+            else:
+                ids.extend(self._extract_member_ids(value))
+        return ids
+
+    def _join_keys(
+        self, room: str, real_name: str, member_ids: List[str]
+    ) -> Tuple[List[str], List[str]]:
+        """
+        返回 (判断用的 key, 发送成功后记录的 key)
+        有成员 id 的消息按 id 判断，同名的不同成员不会互相跳过；
+        纯文本消息只有用户名，和同名的任意加群消息视为同一次加群
+        """
+        if member_ids:
+            ids = [f"{room}:id:{member_id}" for member_id in member_ids]
+            return ids + [f"{room}:text:{real_name}"], ids + [f"{room}:name:{real_name}"]
+        keys = [f"{room}:text:{real_name}", f"{room}:name:{real_name}"]
+        return keys, keys
+
     async def _handle_message_async(self, target, image_url) -> Optional[str]:
         temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
         temp_path = temp_file.name
         with open(temp_path, "wb") as f:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(image_url)
-                f.write(response.content)
+            # 复用连接池，不再每次下载都新建客户端
+            with track_call(self.name, "poster_download"):
+                response = await self.download_client.get(image_url)
+            f.write(response.content)
         return temp_path
 
+    @instrument_plugin
     async def handle_message(self, plusginExcuteContext: PluginExcuteContext) -> None:
         if not self.enabled:
             return
         message = plusginExcuteContext.get_message()
-        if message.local_type != MessageType.System:
+        if not self.message_filter.matches_type(message.local_type):
+            return
+        if not self.admission.admit(self.name, message):
             return
         if message.room:
             self.logger.info(message.content)
             real_name = ""
+            member_ids: List[str] = []
             try:
                 # 如果是自己拉，可能是json，如果是别人拉，可能就是普通的文本字符串
                 # 这如何判断是群聊呢，这里应该要加一个开关，用于明确，是否需要监听别人的加群信号，因为如果机器人加入了太多的群
@@ -156,6 +248,7 @@ class WelcomePlugin(Plugin):
                         return
                     if msg_type_key and msg_type_key in sysmsg:
                         plain_text = sysmsg[msg_type_key].get("plain", "")
+                        member_ids = self._extract_member_ids(sysmsg[msg_type_key])
 
                         # 使用通用的方法提取用户名
                         real_name = self._extract_quoted_username(plain_text)
@@ -168,10 +261,20 @@ class WelcomePlugin(Plugin):
                         self.logger.info(f"提取到用户名: {real_name}")
             except (json.JSONDecodeError, KeyError) as e:
                 self.logger.error(f"解析欢迎消息内容时出错: {e}")
+                mark_failed(self.name)
                 return
             if not real_name:
                 self.logger.info(f"不是欢迎消息或无法提取名称: {message.content}")
                 return
+            check_keys, join_keys = self._join_keys(
+                message.room.username, real_name, member_ids
+            )
+            if self.joined is not None:
+                duplicate = any(self.joined.contains(key) for key in check_keys)
+                record_result("welcome", duplicate)
+                if duplicate:
+                    self.logger.info(f"{real_name} 的加群事件已经处理过")
+                    return
             try:
                 request_params = {
                     "inputs": {
@@ -182,9 +285,17 @@ class WelcomePlugin(Plugin):
                     "response_mode": "blocking",
                     "user": f"{message.room.username}",
                 }
-                completion_response = self.dify_client.run(**request_params)
-                completion_response.raise_for_status()
-                result = completion_response.json().get("data").get("outputs")
+                with track_call(self.name, "dify_workflow"), LEDGER.call(
+                    message.room.username, "dify-workflow", f"{self.name}/dify_workflow"
+                ) as entry:
+                    # 同步 HTTP 调用放到线程中执行，不阻塞其他会话的消息处理
+                    completion_response = await asyncio.to_thread(
+                        self.dify_client.run, **request_params
+                    )
+                    completion_response.raise_for_status()
+                    data = completion_response.json().get("data")
+                    entry.set_usage(total_tokens=data.get("total_tokens"))
+                result = data.get("outputs")
                 workflow_result = json.loads(result.get("text", "{}"))
                 if not workflow_result.get("image_urls", []):
                     self.logger.info(f"没有生成图片")
@@ -213,10 +324,15 @@ class WelcomePlugin(Plugin):
                                 ],
                             )
                         )
+                        # 海报生成成功后才记录，失败的加群事件再次投递时会重试
+                        if self.joined is not None:
+                            for key in join_keys:
+                                self.joined.add(key)
                     plusginExcuteContext.should_stop = True
             except Exception as e:
                 self.logger.error(f"处理消息时出错, 拦截消息: {e}")
                 self.logger.info(request_params)
+                mark_failed(self.name)
                 return
 
     def get_plugin_name(self) -> str: